@@ -4,13 +4,16 @@ Command-line interface for PyFlexWeb.
 This module provides the main entry point and argument parsing for the PyFlexWeb CLI.
 """
 
+import functools
+import logging
 import sys
+from types import SimpleNamespace as Args
+from typing import TYPE_CHECKING
 
 import click
-import platformdirs
 
-from .database import FlexDatabase
 from .handlers import (
+    MAX_CONCURRENT_REQUESTS,
     VALID_QUERY_TYPES,
     handle_config_command,
     handle_download_command,
@@ -18,36 +21,73 @@ from .handlers import (
     handle_token_command,
 )
 
+if TYPE_CHECKING:
+    from .database import FlexDatabase
+
+
+@functools.lru_cache(maxsize=1)
+def _default_output_dir() -> str:
+    """Return the default report directory (resolved once per process)."""
+    import platformdirs
+
+    return str(platformdirs.user_data_path("pyflexweb"))
+
+
+def _get_db(ctx) -> "FlexDatabase":
+    """Return the shared database, opening it on first use."""
+    if ctx.obj["db"] is None:
+        from .database import FlexDatabase
+
+        ctx.obj["db"] = FlexDatabase()
+    return ctx.obj["db"]
+
+
+# Download options that fall back to a stored config value when not given on the command line
+_CONFIG_MAPPINGS = {
+    "output_dir": "default_output_dir",
+    "poll_interval": "default_poll_interval",
+    "max_attempts": "default_max_attempts",
+}
+_CONFIG_DEFAULTS = {"default_poll_interval": "30", "default_max_attempts": "20"}
+
+
+def _resolve_config_option(db: "FlexDatabase", option_name: str):
+    """Return the configured (or built-in default) value for a download option."""
+    config_key = _CONFIG_MAPPINGS[option_name]
+    if option_name == "output_dir":
+        return db.get_config(config_key, _default_output_dir())
+    return int(db.get_config(config_key, _CONFIG_DEFAULTS[config_key]))
+
 
 def get_effective_options(ctx, **provided_options):
     """Get effective options by combining provided options with defaults from config."""
-    db = ctx.obj["db"]
     effective = {}
+    for option_name, value in provided_options.items():
+        if value is None and option_name in _CONFIG_MAPPINGS:
+            value = _resolve_config_option(_get_db(ctx), option_name)
+        effective[option_name] = value
+    return effective
 
-    config_mappings = {
-        "default_output_dir": "output_dir",
-        "default_poll_interval": "poll_interval",
-        "default_max_attempts": "max_attempts",
-    }
-
-    for config_key, option_name in config_mappings.items():
-        provided_value = provided_options.get(option_name)
-        if provided_value is not None:
-            effective[option_name] = provided_value
-        elif option_name == "poll_interval":
-            effective[option_name] = int(db.get_config(config_key, "30"))
-        elif option_name == "max_attempts":
-            effective[option_name] = int(db.get_config(config_key, "20"))
-        elif option_name == "output_dir":
-            default_output_dir = str(platformdirs.user_data_path("pyflexweb"))
-            effective[option_name] = db.get_config(config_key, default_output_dir)
-
-    # Keep other options as-is
-    for key, value in provided_options.items():
-        if key not in config_mappings.values():
-            effective[key] = value
 
-    return effective
+class _EchoHandler(logging.Handler):
+    """Write log records with click.echo, so they follow the current stdout (including CliRunner's)."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            click.echo(self.format(record))
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+
+def _configure_logging() -> None:
+    """Print pyflexweb progress messages to stdout as plain lines; safe to call more than once."""
+    logger = logging.getLogger("pyflexweb")
+    if any(isinstance(handler, _EchoHandler) for handler in logger.handlers):
+        return
+    handler = _EchoHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
 
 
 @click.group(invoke_without_command=True)
@@ -58,16 +98,22 @@ def cli(ctx):
 
     Use 'pyflexweb config' to view/modify default settings.
     """
-    db = FlexDatabase()
     ctx.ensure_object(dict)
-    ctx.obj["db"] = db
+    _configure_logging()
+    # Opened lazily so --help and friends never touch the database
+    ctx.obj["db"] = None
 
     if ctx.invoked_subcommand is None:
+        if not sys.stdout.isatty():
+            # Scripts only need to know the invocation was wrong; skip formatting the full help
+            click.echo(ctx.get_usage())
+            click.echo(f"Try '{ctx.command_path} --help' for help.")
+            ctx.exit(1)
         click.echo(ctx.get_help())
-        click.echo(f"\nDatabase directory: {db.db_dir}")
-        default_output_dir = str(platformdirs.user_data_path("pyflexweb"))
-        click.echo(f"Default output directory: {default_output_dir}")
-        exit(1)
+        # The database lives in the default data directory, so there is no need to open it here
+        click.echo(f"\nDatabase directory: {_default_output_dir()}")
+        click.echo(f"Default output directory: {_default_output_dir()}")
+        ctx.exit(1)
 
     return 0
 
@@ -80,8 +126,8 @@ def cli(ctx):
 def token(ctx):
     """Manage IBKR Flex token."""
     if ctx.invoked_subcommand is None:
-        args = type("Args", (), {"subcommand": "get"})
-        return handle_token_command(args, ctx.obj["db"])
+        args = Args(subcommand="get")
+        return handle_token_command(args, _get_db(ctx))
 
 
 @token.command("set")
@@ -89,24 +135,24 @@ def token(ctx):
 @click.pass_context
 def token_set(ctx, token_value):
     """Set your IBKR token."""
-    args = type("Args", (), {"subcommand": "set", "token": token_value})
-    return handle_token_command(args, ctx.obj["db"])
+    args = Args(subcommand="set", token=token_value)
+    return handle_token_command(args, _get_db(ctx))
 
 
 @token.command("get")
 @click.pass_context
 def token_get(ctx):
     """Display your stored token."""
-    args = type("Args", (), {"subcommand": "get"})
-    return handle_token_command(args, ctx.obj["db"])
+    args = Args(subcommand="get")
+    return handle_token_command(args, _get_db(ctx))
 
 
 @token.command("unset")
 @click.pass_context
 def token_unset(ctx):
     """Remove your stored token."""
-    args = type("Args", (), {"subcommand": "unset"})
-    return handle_token_command(args, ctx.obj["db"])
+    args = Args(subcommand="unset")
+    return handle_token_command(args, _get_db(ctx))
 
 
 # --- Config commands ---
@@ -117,8 +163,8 @@ def token_unset(ctx):
 def config(ctx):
     """Manage default configuration settings."""
     if ctx.invoked_subcommand is None:
-        args = type("Args", (), {"subcommand": "list", "key": None})
-        return handle_config_command(args, ctx.obj["db"])
+        args = Args(subcommand="list", key=None)
+        return handle_config_command(args, _get_db(ctx))
 
 
 @config.command("set")
@@ -133,8 +179,8 @@ def config_set(ctx, key, value):
     - default_poll_interval: Default seconds between polling attempts
     - default_max_attempts: Default maximum polling attempts
     """
-    args = type("Args", (), {"subcommand": "set", "key": key, "value": value})
-    return handle_config_command(args, ctx.obj["db"])
+    args = Args(subcommand="set", key=key, value=value)
+    return handle_config_command(args, _get_db(ctx))
 
 
 @config.command("get")
@@ -142,8 +188,8 @@ def config_set(ctx, key, value):
 @click.pass_context
 def config_get(ctx, key):
     """Get configuration value(s)."""
-    args = type("Args", (), {"subcommand": "get", "key": key})
-    return handle_config_command(args, ctx.obj["db"])
+    args = Args(subcommand="get", key=key)
+    return handle_config_command(args, _get_db(ctx))
 
 
 @config.command("unset")
@@ -151,16 +197,16 @@ def config_get(ctx, key):
 @click.pass_context
 def config_unset(ctx, key):
     """Remove a configuration value."""
-    args = type("Args", (), {"subcommand": "unset", "key": key})
-    return handle_config_command(args, ctx.obj["db"])
+    args = Args(subcommand="unset", key=key)
+    return handle_config_command(args, _get_db(ctx))
 
 
 @config.command("list")
 @click.pass_context
 def config_list(ctx):
     """List all configuration values."""
-    args = type("Args", (), {"subcommand": "list", "key": None})
-    return handle_config_command(args, ctx.obj["db"])
+    args = Args(subcommand="list", key=None)
+    return handle_config_command(args, _get_db(ctx))
 
 
 # --- Query commands ---
@@ -172,8 +218,8 @@ def config_list(ctx):
 def query(ctx, json_output):
     """Manage Flex query IDs."""
     if ctx.invoked_subcommand is None:
-        args = type("Args", (), {"subcommand": "list", "json_output": json_output})
-        return handle_query_command(args, ctx.obj["db"])
+        args = Args(subcommand="list", json_output=json_output)
+        return handle_query_command(args, _get_db(ctx))
     return 0
 
 
@@ -185,10 +231,8 @@ def query(ctx, json_output):
 @click.pass_context
 def query_add(ctx, query_id, name, query_type, min_interval):
     """Add a new query ID."""
-    args = type(
-        "Args", (), {"subcommand": "add", "query_id": query_id, "name": name, "query_type": query_type, "min_interval": min_interval}
-    )
-    return handle_query_command(args, ctx.obj["db"])
+    args = Args(subcommand="add", query_id=query_id, name=name, query_type=query_type, min_interval=min_interval)
+    return handle_query_command(args, _get_db(ctx))
 
 
 @query.command("remove")
@@ -196,8 +240,8 @@ def query_add(ctx, query_id, name, query_type, min_interval):
 @click.pass_context
 def query_remove(ctx, query_id):
     """Remove a query ID."""
-    args = type("Args", (), {"subcommand": "remove", "query_id": query_id})
-    return handle_query_command(args, ctx.obj["db"])
+    args = Args(subcommand="remove", query_id=query_id)
+    return handle_query_command(args, _get_db(ctx))
 
 
 @query.command("rename")
@@ -206,8 +250,8 @@ def query_remove(ctx, query_id):
 @click.pass_context
 def query_rename(ctx, query_id, name):
     """Rename a query."""
-    args = type("Args", (), {"subcommand": "rename", "query_id": query_id, "name": name})
-    return handle_query_command(args, ctx.obj["db"])
+    args = Args(subcommand="rename", query_id=query_id, name=name)
+    return handle_query_command(args, _get_db(ctx))
 
 
 @query.command("interval")
@@ -225,18 +269,18 @@ def query_interval(ctx, query_id, hours, unset):
       pyflexweb query interval 12345 --unset  # revert to type default
     """
     if not unset and hours is None:
-        query_info = ctx.obj["db"].get_query_info(query_id)
+        query_info = _get_db(ctx).get_query_info(query_id)
         if not query_info:
             print(f"Query ID {query_id} not found.")
             return 1
-        interval = query_info.get("min_interval")
+        interval = query_info.min_interval
         if interval is not None:
             print(f"Query {query_id} min interval: {interval}h")
         else:
             print(f"Query {query_id} uses the type default interval.")
         return 0
-    args = type("Args", (), {"subcommand": "interval", "query_id": query_id, "hours": hours, "unset": unset})
-    return handle_query_command(args, ctx.obj["db"])
+    args = Args(subcommand="interval", query_id=query_id, hours=hours, unset=unset)
+    return handle_query_command(args, _get_db(ctx))
 
 
 @query.command("list")
@@ -244,8 +288,8 @@ def query_interval(ctx, query_id, hours, unset):
 @click.pass_context
 def query_list(ctx, json_output):
     """List all stored query IDs."""
-    args = type("Args", (), {"subcommand": "list", "json_output": json_output})
-    return handle_query_command(args, ctx.obj["db"])
+    args = Args(subcommand="list", json_output=json_output)
+    return handle_query_command(args, _get_db(ctx))
 
 
 # --- Download command ---
@@ -258,8 +302,15 @@ def query_list(ctx, json_output):
 @click.option("--output-dir", help="Directory to save reports")
 @click.option("--poll-interval", type=int, help="Seconds to wait between polling attempts")
 @click.option("--max-attempts", type=int, help="Maximum number of polling attempts")
+@click.option(
+    "--max-concurrent",
+    type=click.IntRange(min=1),
+    default=MAX_CONCURRENT_REQUESTS,
+    show_default=True,
+    help="Maximum IBKR calls (report requests and polls) in flight at once",
+)
 @click.pass_context
-def download(ctx, query, force, output, output_dir, poll_interval, max_attempts):
+def download(ctx, query, force, output, output_dir, poll_interval, max_attempts, max_concurrent):
     """Download Flex reports.
 
     If --query is not specified, downloads all queries that are due based on their
@@ -267,11 +318,18 @@ def download(ctx, query, force, output, output_dir, poll_interval, max_attempts)
     be set with 'query interval <id> <hours>'.
     """
     effective_options = get_effective_options(
-        ctx, query=query, force=force, output=output, output_dir=output_dir, poll_interval=poll_interval, max_attempts=max_attempts
+        ctx,
+        query=query,
+        force=force,
+        output=output,
+        output_dir=output_dir,
+        poll_interval=poll_interval,
+        max_attempts=max_attempts,
+        max_concurrent=max_concurrent,
     )
 
-    args = type("Args", (), effective_options)
-    return handle_download_command(args, ctx.obj["db"])
+    args = Args(**effective_options)
+    return handle_download_command(args, _get_db(ctx))
 
 
 # --- Status command (convenience alias) ---
@@ -281,8 +339,8 @@ def download(ctx, query, force, output, output_dir, poll_interval, max_attempts)
 @click.pass_context
 def status(ctx):
     """Show status of all stored queries (alias for 'query list')."""
-    args = type("Args", (), {"subcommand": "list"})
-    return handle_query_command(args, ctx.obj["db"])
+    args = Args(subcommand="list", json_output=False)
+    return handle_query_command(args, _get_db(ctx))
 
 
 def main():
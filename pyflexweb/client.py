@@ -1,5 +1,6 @@
 """Client module for communicating with IBKR Flex Web Service."""
 
+import os
 import sys
 import xml.etree.ElementTree as ET
 
@@ -12,6 +13,9 @@ class IBKRFlexClient:
     BASE_URL = "https://gdcdyn.interactivebrokers.com/Universal/servlet"
     REQUEST_URL = f"{BASE_URL}/FlexStatementService.SendRequest"
     STATEMENT_URL = f"{BASE_URL}/FlexStatementService.GetStatement"
+    CHUNK_SIZE = 64 * 1024
+    # Bytes read before deciding whether a GetStatement response is a status document or the report
+    SNIFF_SIZE = 1024
 
     def __init__(self, token: str):
         self.token = token
@@ -53,15 +57,7 @@ class IBKRFlexClient:
 
             # Check if this is an error response
             if "<ErrorCode>" in response.text:
-                root = ET.fromstring(response.text)
-                status = root.find(".//Status").text
-
-                if status == "Pending":
-                    return None  # Report not ready yet
-
-                error = root.find(".//ErrorMessage")
-                if error is not None:
-                    print(f"Error retrieving report: {error.text}", file=sys.stderr)
+                self._report_statement_error(response.text)
                 return None
 
             # If we got here, we have the actual report
@@ -73,3 +69,65 @@ class IBKRFlexClient:
         except ET.ParseError as e:
             print(f"Error parsing response: {e}", file=sys.stderr)
             return None
+
+    def save_report(self, request_id: str, output_path: str) -> bool:
+        """Stream a report to output_path in chunks. Returns True once written, False if not ready or on error.
+
+        The report is streamed into a temporary file next to output_path and only moved into place once
+        complete, so an interrupted download never replaces an existing report with a truncated one.
+        Errors writing the file (OSError) are left to the caller.
+        """
+        url = f"{self.STATEMENT_URL}?t={self.token}&q={request_id}&v=3"
+
+        try:
+            with requests.get(url, stream=True) as response:
+                response.raise_for_status()
+                chunks = response.iter_content(chunk_size=self.CHUNK_SIZE)
+                # iter_content may hand back pieces far smaller than CHUNK_SIZE (chunked encoding, gzip),
+                # so gather enough of the body to see its root element before classifying it
+                first = b""
+                for chunk in chunks:
+                    first += chunk
+                    if len(first) >= self.SNIFF_SIZE:
+                        break
+                if not first:
+                    return False
+
+                # Status and error responses are FlexStatementResponse documents; reports are anything else
+                if b"<FlexStatementResponse" in first or b"<ErrorCode>" in first:
+                    self._report_statement_error((first + b"".join(chunks)).decode("utf-8"))
+                    return False
+
+                # Created with os.open and mode 0o666 so the umask applies, as it would for a plain open()
+                tmp_path = f"{output_path}.{os.urandom(4).hex()}.part"
+                fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(first)
+                        for chunk in chunks:
+                            f.write(chunk)
+                    os.replace(tmp_path, output_path)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+                return True
+
+        except requests.exceptions.RequestException as e:
+            print(f"Network error: {e}", file=sys.stderr)
+            return False
+        except ET.ParseError as e:
+            print(f"Error parsing response: {e}", file=sys.stderr)
+            return False
+
+    @staticmethod
+    def _report_statement_error(text: str) -> None:
+        """Print the error from a GetStatement status response; pending reports are not an error."""
+        root = ET.fromstring(text)
+        status = root.find(".//Status").text
+
+        if status == "Pending":
+            return  # Report not ready yet
+
+        error = root.find(".//ErrorMessage")
+        if error is not None:
+            print(f"Error retrieving report: {error.text}", file=sys.stderr)
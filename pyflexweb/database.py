@@ -2,21 +2,82 @@
 
 import os
 import sqlite3
-from datetime import datetime, timedelta
+from dataclasses import dataclass
 
 import platformdirs
 
+# Local time as an ISO-8601 string, matching the format of timestamps written by earlier versions
+_SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+
+@dataclass(slots=True)
+class Request:
+    """A report request sent to IBKR and its outcome."""
+
+    request_id: str
+    query_id: str
+    status: str
+    requested_at: str | None
+    completed_at: str | None
+    output_path: str | None
+
+
+@dataclass(slots=True)
+class Query:
+    """A stored Flex query."""
+
+    id: str
+    name: str | None
+    type: str
+    min_interval: int | None
+
+
+@dataclass(slots=True)
+class QueryStatus(Query):
+    """A stored Flex query together with its most recent request, if any."""
+
+    latest_request: Request | None = None
+
 
 class FlexDatabase:
     """Manages the local database for tokens, queries, and download history."""
 
-    DB_VERSION = 4  # Increment when schema changes
+    DB_VERSION = 5  # Increment when schema changes
+
+    # Statements shared by several methods or run in loops. Passing the same text every time
+    # lets sqlite3's per-connection statement cache reuse the prepared statement.
+    _SQL_SET_CONFIG = "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)"
+    _SQL_GET_REQUEST = "SELECT request_id, query_id, status, requested_at, completed_at, output_path FROM requests WHERE request_id = ?"
+    _SQL_GET_LATEST_REQUEST = """
+        SELECT request_id, query_id, status, requested_at, completed_at, output_path FROM requests
+        WHERE query_id = ?
+        ORDER BY requested_at DESC, rowid DESC
+        LIMIT 1
+    """
+    _SQL_RECORD_REQUEST_OUTCOME = f"""
+        INSERT INTO requests (request_id, query_id, status, requested_at, completed_at, last_updated, output_path)
+        VALUES (
+            ?1, ?2, ?3, ?4,
+            CASE WHEN ?3 = 'completed' THEN {_SQL_NOW} END,
+            {_SQL_NOW},
+            CASE WHEN ?3 = 'completed' THEN ?5 END
+        )
+        ON CONFLICT (request_id) DO UPDATE SET
+            status = excluded.status,
+            last_updated = excluded.last_updated,
+            completed_at = COALESCE(excluded.completed_at, requests.completed_at),
+            output_path = CASE WHEN excluded.status = 'completed' THEN excluded.output_path ELSE requests.output_path END
+    """
 
     def __init__(self, db_dir: str = None):
         self.db_dir = db_dir if db_dir is not None else platformdirs.user_data_dir("pyflexweb")
         os.makedirs(self.db_dir, exist_ok=True)
         self.db_path = os.path.join(self.db_dir, "status.db")
         self.conn = self._init_db()
+        # Config rows change rarely, so they are loaded once and kept in sync by the setters
+        self._config_cache: dict[str, str] | None = None
+        # Query rows by id (None for unknown ids); entries are dropped whenever a query changes
+        self._query_info_cache: dict[str, Query | None] = {}
 
     def get_db_path(self) -> str:
         """Return the path to the database file."""
@@ -24,9 +85,15 @@ class FlexDatabase:
 
     def _init_db(self) -> sqlite3.Connection:
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
 
-        cursor.execute(
+        # WAL with synchronous=NORMAL only fsyncs at checkpoints instead of on every commit
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -8000")  # 8 MB
+        conn.execute("PRAGMA mmap_size = 67108864")  # 64 MB
+
+        conn.execute(
             """
         CREATE TABLE IF NOT EXISTS config (
             key TEXT PRIMARY KEY,
@@ -35,7 +102,7 @@ class FlexDatabase:
         """
         )
 
-        cursor.execute(
+        conn.execute(
             """
         CREATE TABLE IF NOT EXISTS queries (
             id TEXT PRIMARY KEY,
@@ -45,7 +112,7 @@ class FlexDatabase:
         """
         )
 
-        cursor.execute(
+        conn.execute(
             """
         CREATE TABLE IF NOT EXISTS requests (
             request_id TEXT PRIMARY KEY,
@@ -65,254 +132,233 @@ class FlexDatabase:
 
     def _check_migration(self, conn: sqlite3.Connection) -> None:
         """Check if database needs migration and perform if needed."""
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT value FROM config WHERE key = 'db_version' LIMIT 1")
-        result = cursor.fetchone()
-        current_version = int(result[0]) if result else 0
-
+        current_version = conn.execute("PRAGMA user_version").fetchone()[0]
         if current_version >= self.DB_VERSION:
             return
 
-        if current_version < 1:
-            try:
-                cursor.execute("ALTER TABLE requests ADD COLUMN last_updated DATETIME")
-                conn.commit()
-            except sqlite3.OperationalError:
-                pass
-
-        if current_version < 2:
-            cursor.execute("PRAGMA table_info(queries)")
-            columns = cursor.fetchall()
-            has_report_type = any(col[1] == "report_type" for col in columns)
-
-            if has_report_type:
-                cursor.execute("SELECT id, name FROM queries")
-                queries = cursor.fetchall()
-                cursor.execute("DROP TABLE queries")
-                cursor.execute(
+        if current_version == 0:
+            # Databases from older releases track their version in the config table
+            result = conn.execute("SELECT value FROM config WHERE key = 'db_version' LIMIT 1").fetchone()
+            current_version = int(result[0]) if result else 0
+
+        # Run every step in one transaction so an upgrade is atomic and commits once
+        conn.execute("BEGIN")
+        try:
+            if current_version < 1:
+                try:
+                    conn.execute("ALTER TABLE requests ADD COLUMN last_updated DATETIME")
+                except sqlite3.OperationalError:
+                    pass
+
+            if current_version < 2:
+                columns = conn.execute("PRAGMA table_info(queries)").fetchall()
+                has_report_type = any(col[1] == "report_type" for col in columns)
+
+                if has_report_type:
+                    queries = conn.execute("SELECT id, name FROM queries").fetchall()
+                    conn.execute("DROP TABLE queries")
+                    conn.execute(
+                        """
+                    CREATE TABLE queries (
+                        id TEXT PRIMARY KEY,
+                        name TEXT,
+                        added_on DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
                     """
-                CREATE TABLE queries (
-                    id TEXT PRIMARY KEY,
-                    name TEXT,
-                    added_on DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-                )
-                for query_id, name in queries:
-                    cursor.execute("INSERT INTO queries (id, name) VALUES (?, ?)", (query_id, name))
-
-        if current_version < 3:
-            try:
-                cursor.execute("ALTER TABLE queries ADD COLUMN min_interval INTEGER")
-                conn.commit()
-            except sqlite3.OperationalError:
-                pass
-
-        if current_version < 4:
-            try:
-                cursor.execute("ALTER TABLE queries ADD COLUMN type TEXT DEFAULT 'activity'")
-                conn.commit()
-            except sqlite3.OperationalError:
-                pass
-
-        cursor.execute(
-            "INSERT OR REPLACE INTO config VALUES (?, ?)",
-            ("db_version", str(self.DB_VERSION)),
-        )
+                    )
+                    conn.executemany("INSERT INTO queries (id, name) VALUES (?, ?)", queries)
+
+            if current_version < 3:
+                try:
+                    conn.execute("ALTER TABLE queries ADD COLUMN min_interval INTEGER")
+                except sqlite3.OperationalError:
+                    pass
+
+            if current_version < 4:
+                try:
+                    conn.execute("ALTER TABLE queries ADD COLUMN type TEXT DEFAULT 'activity'")
+                except sqlite3.OperationalError:
+                    pass
+
+            if current_version < 5:
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_query_time ON requests (query_id, requested_at DESC)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_status ON requests (query_id, status, last_updated DESC)")
+
+            conn.execute("DELETE FROM config WHERE key = 'db_version'")
+            conn.execute(f"PRAGMA user_version = {self.DB_VERSION}")
+        except Exception:
+            conn.rollback()
+            raise
         conn.commit()
 
     # --- Token ---
 
     def set_token(self, token: str) -> None:
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT OR REPLACE INTO config VALUES (?, ?)", ("token", token))
-        self.conn.commit()
+        self.set_config("token", token)
 
     def get_token(self) -> str | None:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT value FROM config WHERE key = ?", ("token",))
-        result = cursor.fetchone()
-        return result[0] if result else None
+        return self.get_config("token")
 
     def unset_token(self) -> None:
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM config WHERE key = ?", ("token",))
-        self.conn.commit()
+        self.unset_config("token")
 
     # --- Config ---
 
+    def _config(self) -> dict[str, str]:
+        """Return all config rows, loading them with a single query on first access."""
+        if self._config_cache is None:
+            self._config_cache = dict(self.conn.execute("SELECT key, value FROM config"))
+        return self._config_cache
+
     def set_config(self, key: str, value: str) -> None:
-        cursor = self.conn.cursor()
-        cursor.execute("INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)", (key, value))
+        config = self._config()
+        if config.get(key) == value:
+            return  # unchanged; skip the write and commit
+        self.conn.execute(self._SQL_SET_CONFIG, (key, value))
         self.conn.commit()
+        config[key] = value
 
     def get_config(self, key: str, default: str = None) -> str:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT value FROM config WHERE key = ?", (key,))
-        result = cursor.fetchone()
-        return result[0] if result else default
+        return self._config().get(key, default)
 
     def list_config(self) -> dict:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT key, value FROM config WHERE key != 'token' AND key != 'db_version' ORDER BY key")
-        return dict(cursor.fetchall())
+        return {k: v for k, v in sorted(self._config().items()) if k != "token"}
 
     def unset_config(self, key: str) -> bool:
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM config WHERE key = ?", (key,))
+        cursor = self.conn.execute("DELETE FROM config WHERE key = ?", (key,))
         self.conn.commit()
+        self._config().pop(key, None)
         return cursor.rowcount > 0
 
     # --- Queries ---
 
     def add_query(self, query_id: str, name: str, query_type: str = "activity", min_interval: int | None = None) -> None:
-        cursor = self.conn.cursor()
-        cursor.execute(
+        self.conn.execute(
             "INSERT OR REPLACE INTO queries (id, name, type, min_interval) VALUES (?, ?, ?, ?)",
             (query_id, name, query_type, min_interval),
         )
         self.conn.commit()
+        self._query_info_cache.pop(query_id, None)
 
     def set_query_interval(self, query_id: str, min_interval: int | None) -> bool:
         """Set the minimum download interval (hours) for a query. None to use type default."""
-        cursor = self.conn.cursor()
-        cursor.execute("UPDATE queries SET min_interval = ? WHERE id = ?", (min_interval, query_id))
+        cursor = self.conn.execute("UPDATE queries SET min_interval = ? WHERE id = ?", (min_interval, query_id))
         self.conn.commit()
+        self._query_info_cache.pop(query_id, None)
         return cursor.rowcount > 0
 
     def remove_query(self, query_id: str) -> bool:
-        cursor = self.conn.cursor()
-        cursor.execute("DELETE FROM queries WHERE id = ?", (query_id,))
+        cursor = self.conn.execute("DELETE FROM queries WHERE id = ?", (query_id,))
         self.conn.commit()
+        self._query_info_cache.pop(query_id, None)
         return cursor.rowcount > 0
 
     def rename_query(self, query_id: str, new_name: str) -> bool:
-        cursor = self.conn.cursor()
-        cursor.execute("UPDATE queries SET name = ? WHERE id = ?", (new_name, query_id))
+        cached = self._query_info_cache.get(query_id)
+        if cached is not None and cached.name == new_name:
+            return True
+        cursor = self.conn.execute("UPDATE queries SET name = ? WHERE id = ?", (new_name, query_id))
         self.conn.commit()
+        self._query_info_cache.pop(query_id, None)
         return cursor.rowcount > 0
 
     def list_queries(self) -> list[tuple[str, str]]:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name FROM queries ORDER BY added_on")
-        return cursor.fetchall()
-
-    def get_query_info(self, query_id: str) -> dict | None:
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name, type, min_interval FROM queries WHERE id = ?", (query_id,))
-        result = cursor.fetchone()
-        if not result:
-            return None
-        return {"id": result[0], "name": result[1], "type": result[2] or "activity", "min_interval": result[3]}
-
-    def get_all_queries_with_status(self) -> list[dict]:
+        return self.conn.execute("SELECT id, name FROM queries ORDER BY added_on").fetchall()
+
+    def get_query_info(self, query_id: str) -> Query | None:
+        if query_id in self._query_info_cache:
+            return self._query_info_cache[query_id]
+        result = self.conn.execute("SELECT id, name, type, min_interval FROM queries WHERE id = ?", (query_id,)).fetchone()
+        query_info = None
+        if result:
+            query_info = Query(result[0], result[1], result[2] or "activity", result[3])
+        self._query_info_cache[query_id] = query_info
+        return query_info
+
+    def get_all_queries_with_status(self) -> list[QueryStatus]:
         """Get all queries with their latest download status."""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name, type, min_interval FROM queries ORDER BY added_on")
-        queries = cursor.fetchall()
+        cursor = self.conn.execute(
+            """
+            SELECT q.id, q.name, q.type, q.min_interval,
+                   r.request_id, r.query_id, r.status, r.requested_at, r.completed_at, r.output_path
+            FROM queries q
+            LEFT JOIN requests r ON r.request_id = (
+                SELECT request_id FROM requests
+                WHERE query_id = q.id
+                ORDER BY requested_at DESC, rowid DESC
+                LIMIT 1
+            )
+            ORDER BY q.added_on
+        """
+        )
 
         result = []
-        for query_id, name, query_type, min_interval in queries:
-            query_info = {
-                "id": query_id,
-                "name": name,
-                "type": query_type or "activity",
-                "min_interval": min_interval,
-                "latest_request": None,
-            }
-            latest = self.get_latest_request(query_id)
-            if latest:
-                query_info["latest_request"] = latest
-            result.append(query_info)
+        for row in cursor:
+            query_id, name, query_type, min_interval = row[:4]
+            query_type = query_type or "activity"
+            self._query_info_cache[query_id] = Query(query_id, name, query_type, min_interval)
+            latest = Request(*row[4:]) if row[4] is not None else None
+            result.append(QueryStatus(query_id, name, query_type, min_interval, latest))
 
         return result
 
     # --- Download history (internal) ---
 
-    def add_request(self, request_id: str, query_id: str) -> None:
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "INSERT INTO requests (request_id, query_id, status, requested_at) VALUES (?, ?, ?, ?)",
-            (request_id, query_id, "pending", datetime.now().isoformat()),
-        )
-        self.conn.commit()
+    def record_request_outcome(
+        self, request_id: str, query_id: str, status: str, requested_at: str, output_path: str | None = None
+    ) -> None:
+        """Write a finished request with its final status in a single upsert.
 
-    def update_request_status(self, request_id: str, status: str, output_path: str | None = None) -> None:
-        cursor = self.conn.cursor()
-        now = datetime.now().isoformat()
-        if status == "completed":
-            cursor.execute(
-                "UPDATE requests SET status = ?, completed_at = ?, output_path = ?, last_updated = ? WHERE request_id = ?",
-                (status, now, output_path, now, request_id),
-            )
-        else:
-            cursor.execute(
-                "UPDATE requests SET status = ?, last_updated = ? WHERE request_id = ?",
-                (status, now, request_id),
-            )
-        self.conn.commit()
+        completed_at and last_updated are stamped by SQLite when the row is written; completed_at and
+        output_path are only set for 'completed' outcomes.
+        """
+        with self.conn:
+            self.conn.execute(self._SQL_RECORD_REQUEST_OUTCOME, (request_id, query_id, status, requested_at, output_path))
 
-    def get_request_info(self, request_id: str) -> dict | None:
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT request_id, query_id, status, requested_at, completed_at, output_path FROM requests WHERE request_id = ?",
-            (request_id,),
-        )
-        result = cursor.fetchone()
-        if not result:
-            return None
-        return {
-            "request_id": result[0],
-            "query_id": result[1],
-            "status": result[2],
-            "requested_at": result[3],
-            "completed_at": result[4],
-            "output_path": result[5],
-        }
-
-    def get_latest_request(self, query_id: str) -> dict | None:
-        cursor = self.conn.cursor()
-        cursor.execute(
-            "SELECT request_id FROM requests WHERE query_id = ? ORDER BY requested_at DESC LIMIT 1",
-            (query_id,),
-        )
-        result = cursor.fetchone()
-        if not result:
-            return None
-        return self.get_request_info(result[0])
+    def get_request_info(self, request_id: str) -> Request | None:
+        row = self.conn.execute(self._SQL_GET_REQUEST, (request_id,)).fetchone()
+        return Request(*row) if row else None
 
-    def get_queries_needing_download(self, type_defaults: dict[str, int]) -> list[dict]:
+    def get_latest_request(self, query_id: str) -> Request | None:
+        row = self.conn.execute(self._SQL_GET_LATEST_REQUEST, (query_id,)).fetchone()
+        return Request(*row) if row else None
+
+    def get_queries_needing_download(self, type_defaults: dict[str, int]) -> list[Query]:
         """Get queries that haven't been downloaded within their effective interval.
 
         Resolution: per-query min_interval > type-based default from type_defaults.
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT id, name, type, min_interval FROM queries")
-        all_queries = cursor.fetchall()
-
-        result = []
-        for query_id, name, query_type, min_interval in all_queries:
-            query_type = query_type or "activity"
-            hours = min_interval if min_interval is not None else type_defaults.get(query_type, 6)
-            cutoff_time = (datetime.now() - timedelta(hours=hours)).isoformat()
-
-            cursor.execute(
-                """
-                SELECT r.request_id FROM requests r
-                WHERE r.query_id = ?
+        if type_defaults:
+            default_hours = "CASE COALESCE(type, 'activity') " + "WHEN ? THEN ? " * len(type_defaults) + "ELSE 6 END"
+        else:
+            default_hours = "6"
+        params = []
+        for query_type, hours in type_defaults.items():
+            params.extend((query_type, hours))
+
+        cursor = self.conn.execute(
+            f"""
+            SELECT q.id, q.name, q.type, q.min_interval
+            FROM (
+                SELECT id, name, COALESCE(type, 'activity') AS type, min_interval, added_on,
+                       strftime(
+                           '%Y-%m-%dT%H:%M:%f', 'now', 'localtime',
+                           printf('-%d hours', COALESCE(min_interval, {default_hours}))
+                       ) AS cutoff
+                FROM queries
+            ) q
+            WHERE NOT EXISTS (
+                SELECT 1 FROM requests r
+                WHERE r.query_id = q.id
                   AND r.status = 'completed'
-                  AND (r.last_updated > ? OR r.completed_at > ?)
-                ORDER BY r.last_updated DESC
-                LIMIT 1
-            """,
-                (query_id, cutoff_time, cutoff_time),
+                  AND (r.last_updated > q.cutoff OR r.completed_at > q.cutoff)
             )
+            ORDER BY q.added_on
+        """,
+            params,
+        )
 
-            if not cursor.fetchone():
-                result.append({"id": query_id, "name": name, "type": query_type, "min_interval": min_interval})
-
-        return result
+        return [Query(*row) for row in cursor]
 
     def close(self) -> None:
         self.conn.close()
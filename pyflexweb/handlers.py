@@ -1,13 +1,23 @@
 """Command handlers for CLI commands."""
 
+from __future__ import annotations
+
+import functools
 import json
+import logging
 import os
-import time
+import re
 from datetime import datetime, timedelta
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    import asyncio
+
+    from .client import IBKRFlexClient
+    from .database import FlexDatabase, Query
 
-from .client import IBKRFlexClient
-from .database import FlexDatabase
+# Download progress; the CLI entry point sends it to stdout as plain lines
+logger = logging.getLogger(__name__)
 
 # Default minimum interval between downloads (hours) per query type
 TYPE_INTERVAL_DEFAULTS = {
@@ -15,14 +25,39 @@ TYPE_INTERVAL_DEFAULTS = {
     "trade-confirmation": 1,
 }
 
-VALID_QUERY_TYPES = list(TYPE_INTERVAL_DEFAULTS.keys())
+VALID_QUERY_TYPES = tuple(TYPE_INTERVAL_DEFAULTS)
+
+# Default number of IBKR calls (report requests and status polls) in flight at once. The Flex Web Service
+# rate-limits each token across both endpoints (error 1018, "too many requests"), so concurrent downloads
+# must not all call it at the same moment
+MAX_CONCURRENT_REQUESTS = 2
+
+
+@functools.lru_cache(maxsize=16)
+def _interval_for(min_interval: int | None, query_type: str) -> int:
+    """Return the effective min-interval hours: the query's own override, else its type default."""
+    if min_interval is not None:
+        return min_interval
+    return TYPE_INTERVAL_DEFAULTS.get(query_type, 6)
 
 
-def _effective_interval(query_info: dict) -> int:
-    """Return the effective min-interval hours for a query."""
-    if query_info.get("min_interval") is not None:
-        return query_info["min_interval"]
-    return TYPE_INTERVAL_DEFAULTS.get(query_info.get("type", "activity"), 6)
+# Characters replaced with "_" in generated report filenames (anything not alphanumeric)
+_UNSAFE_FILENAME_CHARS = re.compile(r"[\W_]")
+
+# Column layout of the `query list` table
+_LIST_ROW = "{:<10} {:<35} {:<20} {:<10} {:<20} {:<10}".format
+
+
+def _dumps_json(data: Any) -> str:
+    """Serialize data as indented JSON, using orjson when it is installed.
+
+    Non-ASCII text is written as-is either way, matching orjson's UTF-8 output.
+    """
+    try:
+        import orjson  # optional speedup, see the "fast" extra
+    except ImportError:
+        return json.dumps(data, indent=2, ensure_ascii=False)
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()
 
 
 def handle_token_command(args: dict[str, Any], db: FlexDatabase) -> int:
@@ -51,8 +86,8 @@ def handle_token_command(args: dict[str, Any], db: FlexDatabase) -> int:
 def handle_query_command(args: dict[str, Any], db: FlexDatabase) -> int:
     """Handle the 'query' command and its subcommands."""
     if args.subcommand == "add":
-        query_type = getattr(args, "query_type", "activity") or "activity"
-        min_interval = getattr(args, "min_interval", None)
+        query_type = args.query_type
+        min_interval = args.min_interval
         db.add_query(args.query_id, args.name, query_type=query_type, min_interval=min_interval)
         parts = [f"Query ID {args.query_id} added ({query_type})."]
         if min_interval is not None:
@@ -81,9 +116,9 @@ def handle_query_command(args: dict[str, Any], db: FlexDatabase) -> int:
         if not query_info:
             print(f"Query ID {args.query_id} not found.")
             return 1
-        if hasattr(args, "unset") and args.unset:
+        if args.unset:
             db.set_query_interval(args.query_id, None)
-            default = TYPE_INTERVAL_DEFAULTS.get(query_info["type"], 6)
+            default = _interval_for(None, query_info.type)
             print(f"Query {args.query_id} will use the type default ({default}h).")
         else:
             db.set_query_interval(args.query_id, args.hours)
@@ -92,7 +127,7 @@ def handle_query_command(args: dict[str, Any], db: FlexDatabase) -> int:
 
     elif args.subcommand == "list":
         queries = db.get_all_queries_with_status()
-        json_output = getattr(args, "json_output", False)
+        json_output = args.json_output
 
         if not queries:
             if json_output:
@@ -105,45 +140,46 @@ def handle_query_command(args: dict[str, Any], db: FlexDatabase) -> int:
             output = []
             for query in queries:
                 item = {
-                    "id": query["id"],
-                    "name": query["name"],
-                    "type": query.get("type", "activity"),
-                    "min_interval": query.get("min_interval"),
-                    "effective_interval": _effective_interval(query),
+                    "id": query.id,
+                    "name": query.name,
+                    "type": query.type,
+                    "min_interval": query.min_interval,
+                    "effective_interval": _interval_for(query.min_interval, query.type),
                     "last_download": None,
                     "status": None,
                 }
-                if query["latest_request"]:
-                    req = query["latest_request"]
-                    item["last_download"] = req["completed_at"] or req["requested_at"]
-                    item["status"] = req["status"]
-                    item["output_path"] = req.get("output_path")
+                if query.latest_request:
+                    req = query.latest_request
+                    item["last_download"] = req.completed_at or req.requested_at
+                    item["status"] = req.status
+                    item["output_path"] = req.output_path
                 output.append(item)
-            print(json.dumps(output, indent=2))
+            print(_dumps_json(output))
             return 0
 
-        print(f"{'ID':<10} {'Name':<35} {'Type':<20} {'Interval':<10} {'Last Download':<20} {'Status':<10}")
-        print(f"{'-' * 10} {'-' * 35} {'-' * 20} {'-' * 10} {'-' * 20} {'-' * 10}")
+        lines = [
+            _LIST_ROW("ID", "Name", "Type", "Interval", "Last Download", "Status"),
+            _LIST_ROW("-" * 10, "-" * 35, "-" * 20, "-" * 10, "-" * 20, "-" * 10),
+        ]
 
         for query in queries:
-            query_id = query["id"]
-            name_display = query["name"] if query["name"] else "unnamed"
-            type_display = query.get("type", "activity")
-            if query.get("min_interval") is not None:
-                interval_display = f"{query['min_interval']}h"
-            else:
-                interval_display = f"{_effective_interval(query)}h"
-
-            if query["latest_request"]:
-                req = query["latest_request"]
-                ts = req["completed_at"] or req["requested_at"]
-                last_time = datetime.fromisoformat(ts).strftime("%Y-%m-%d %H:%M")
-                status = req["status"]
+            name_display = query.name if query.name else "unnamed"
+            interval_display = f"{_interval_for(query.min_interval, query.type)}h"
+
+            if query.latest_request:
+                req = query.latest_request
+                ts = req.completed_at or req.requested_at
+                # Stored timestamps are ISO strings, so the minute-resolution display is a prefix of them
+                last_time = ts[:16].replace("T", " ")
+                status = req.status
             else:
                 last_time = "Never"
                 status = "-"
 
-            print(f"{query_id:<10} {name_display[:35]:<35} {type_display:<20} {interval_display:<10} {last_time:<20} {status:<10}")
+            lines.append(_LIST_ROW(query.id, name_display[:35], query.type, interval_display, last_time, status))
+
+        # One write for the whole table rather than a print per row
+        print("\n".join(lines))
 
         return 0
 
@@ -166,13 +202,13 @@ def handle_download_command(args: dict[str, Any], db: FlexDatabase) -> int:
             if not queries_to_download:
                 print("No queries found. Add one with 'pyflexweb query add <query_id> --name \"Query name\"'")
                 return 0
-            print(f"Force downloading all {len(queries_to_download)} queries")
+            logger.info("Force downloading all %d queries", len(queries_to_download))
         else:
             queries_to_download = db.get_queries_needing_download(TYPE_INTERVAL_DEFAULTS)
             if not queries_to_download:
                 print("All queries are up to date. Use --force to download anyway.")
                 return 0
-            print(f"Found {len(queries_to_download)} queries that need updating")
+            logger.info("Found %d queries that need updating", len(queries_to_download))
     else:
         query_info = db.get_query_info(args.query)
         if not query_info:
@@ -186,96 +222,160 @@ def handle_download_command(args: dict[str, Any], db: FlexDatabase) -> int:
         print("Use --output-dir to specify a directory for all reports.")
         return 1
 
-    # Create output directory if needed
-    output_dir = args.output_dir if hasattr(args, "output_dir") and args.output_dir else "."
-    if output_dir != "." and not os.path.exists(output_dir):
-        try:
-            os.makedirs(output_dir)
-            print(f"Created output directory: {output_dir}")
-        except OSError as e:
-            print(f"Error creating output directory: {e}")
-            return 1
+    output_dir = args.output_dir or "."
 
-    client = IBKRFlexClient(token)
-    overall_success = True
+    # In "all" mode get_queries_needing_download has already applied the interval filter in SQL,
+    # so only an explicitly named query still needs checking here
+    check_interval = not args.force and args.query != "all"
 
+    # Decide what to fetch and where to save it before any network traffic
+    now = datetime.now()
+    today = now.strftime("%Y%m%d")
+    jobs = []
     for query_info in queries_to_download:
-        query_id = query_info["id"]
-        query_name = query_info["name"] or query_id
+        query_id = query_info.id
+        query_name = query_info.name or query_id
 
-        print(f"\nDownloading: {query_name} (ID: {query_id})")
+        logger.info("Downloading: %s (ID: %s)", query_name, query_id)
 
         # Check interval (skip if recently downloaded)
-        if not args.force:
+        if check_interval:
             latest = db.get_latest_request(query_id)
-            if latest and latest["status"] == "completed":
-                completed_at = datetime.fromisoformat(latest["completed_at"])
-                interval_hours = _effective_interval(query_info)
-                cutoff = datetime.now() - timedelta(hours=interval_hours)
-
-                if completed_at > cutoff:
-                    print(f"  Skipped: downloaded within the last {interval_hours}h.")
-                    print(f"  Output file: {latest['output_path']}")
-                    print("  Use --force to download again.")
+            if latest and latest.status == "completed":
+                interval_hours = _interval_for(query_info.min_interval, query_info.type)
+                # Stored timestamps are local ISO strings, so they compare chronologically as text
+                cutoff = (now - timedelta(hours=interval_hours)).isoformat(timespec="milliseconds")
+
+                if latest.completed_at > cutoff:
+                    logger.info("  Skipped: downloaded within the last %sh.", interval_hours)
+                    logger.info("  Output file: %s", latest.output_path)
+                    logger.info("  Use --force to download again.")
                     continue
 
-        # Request report from IBKR
-        request_id = client.request_report(query_id)
-        if not request_id:
-            print("  Failed to request report.")
-            overall_success = False
-            continue
-
-        db.add_request(request_id, query_id)
-
         # Determine output filename
         if len(queries_to_download) == 1 and args.output:
             output_file = os.path.join(output_dir, args.output)
         else:
-            today = datetime.now().strftime("%Y%m%d")
-            safe_desc = "".join(c if c.isalnum() else "_" for c in (query_info["name"] or query_id))
+            safe_desc = _UNSAFE_FILENAME_CHARS.sub("_", query_info.name or query_id)
             output_file = os.path.join(output_dir, f"{safe_desc}_{today}.xml")
 
-        # Poll for the report
-        print(f"  Polling (max {args.max_attempts} attempts, {args.poll_interval}s interval)...")
-        report_xml = None
+        jobs.append((query_info, output_file))
 
-        for attempt in range(1, args.max_attempts + 1):
-            print(f"  Attempt {attempt}/{args.max_attempts}...", end="", flush=True)
-            if attempt == 1:
-                time.sleep(args.poll_interval / 2)
-            report_xml = client.get_report(request_id)
+    # Nothing to fetch: skip creating the output directory and the IBKR client
+    if not jobs:
+        return 0
 
-            if report_xml:
-                print(" OK")
-                break
+    # Create output directory if needed
+    if output_dir != ".":
+        try:
+            os.makedirs(output_dir)
+            print(f"Created output directory: {output_dir}")
+        except FileExistsError:
+            pass
+        except OSError as e:
+            print(f"Error creating output directory: {e}")
+            return 1
 
-            print(" waiting...")
-            if attempt < args.max_attempts:
-                time.sleep(args.poll_interval)
+    # Imported here so commands that never talk to IBKR don't pay for importing asyncio or requests
+    import asyncio
 
-        if not report_xml:
-            print(f"  Report not available after {args.max_attempts} attempts.")
-            db.update_request_status(request_id, "failed")
-            overall_success = False
-            continue
+    from .client import IBKRFlexClient
 
-        # Save the report
-        try:
-            with open(output_file, "w", encoding="utf-8") as f:
-                f.write(report_xml)
-            print(f"  Saved to {output_file}")
-        except OSError as e:
-            print(f"  Error saving report: {e}")
-            db.update_request_status(request_id, "failed")
-            overall_success = False
-            continue
+    client = IBKRFlexClient(token)
 
-        db.update_request_status(request_id, "completed", output_file)
+    results = asyncio.run(_download_all(client, db, jobs, args))
+
+    overall_success = True
+    for (query_info, _), result in zip(jobs, results, strict=True):
+        if isinstance(result, Exception):
+            logger.error("Error downloading %s: %s", query_info.id, result)
+            overall_success = False
+        elif not result:
+            overall_success = False
 
     return 0 if overall_success else 1
 
 
+async def _download_all(client: IBKRFlexClient, db: FlexDatabase, jobs: list, args: Any) -> list:
+    """Run every download job concurrently; results are in job order, with exceptions returned rather than raised.
+
+    At most args.max_concurrent IBKR calls, report requests and polls alike, are in flight at once.
+    """
+    import asyncio
+
+    label_output = len(jobs) > 1
+    ibkr_slots = asyncio.Semaphore(args.max_concurrent)
+    return await asyncio.gather(
+        *(_download_one(client, db, query_info, output_file, args, label_output, ibkr_slots) for query_info, output_file in jobs),
+        return_exceptions=True,
+    )
+
+
+async def _download_one(
+    client: IBKRFlexClient,
+    db: FlexDatabase,
+    query_info: Query,
+    output_file: str,
+    args: Any,
+    label_output: bool,
+    ibkr_slots: asyncio.Semaphore,
+) -> bool:
+    """Request, poll for and save a single report. Returns True on success.
+
+    The request is recorded with its final status as soon as it finishes, so reports already saved
+    stay in the history even if the process is killed while other downloads are still polling.
+
+    The blocking client calls run in worker threads so several queries can poll IBKR at once.
+    Lines are prefixed with the query id when other downloads may be interleaved with them.
+    """
+    import asyncio
+
+    query_id = query_info.id
+    prefix = f"  [{query_id}] " if label_output else "  "
+
+    # Request report from IBKR, waiting for a free slot so the token is not rate-limited
+    async with ibkr_slots:
+        request_id = await asyncio.to_thread(client.request_report, query_id)
+    if not request_id:
+        logger.error("%sFailed to request report.", prefix)
+        return False
+
+    # The row is only written once the download finishes, so note when IBKR accepted the request
+    requested_at = datetime.now().isoformat(timespec="milliseconds")
+
+    # Poll for the report; once it is ready it is streamed straight to output_file
+    logger.info("%sPolling (max %d attempts, %ss interval)...", prefix, args.max_attempts, args.poll_interval)
+    saved = False
+
+    for attempt in range(1, args.max_attempts + 1):
+        if attempt == 1:
+            await asyncio.sleep(args.poll_interval / 2)
+        try:
+            async with ibkr_slots:
+                saved = await asyncio.to_thread(client.save_report, request_id, output_file)
+        except OSError as e:
+            logger.error("%sError saving report: %s", prefix, e)
+            db.record_request_outcome(request_id, query_id, "failed", requested_at)
+            return False
+
+        if saved:
+            logger.info("%sAttempt %d/%d... OK", prefix, attempt, args.max_attempts)
+            break
+
+        logger.info("%sAttempt %d/%d... waiting...", prefix, attempt, args.max_attempts)
+        if attempt < args.max_attempts:
+            await asyncio.sleep(args.poll_interval)
+
+    if not saved:
+        logger.error("%sReport not available after %d attempts.", prefix, args.max_attempts)
+        db.record_request_outcome(request_id, query_id, "failed", requested_at)
+        return False
+
+    logger.info("%sSaved to %s", prefix, output_file)
+    db.record_request_outcome(request_id, query_id, "completed", requested_at, output_file)
+    return True
+
+
 def handle_config_command(args: dict[str, Any], db: FlexDatabase) -> int:
     """Handle the 'config' command and its subcommands."""
     if args.subcommand == "set":
@@ -0,0 +1,18 @@
+"""Shared fixtures for the test suite."""
+
+from unittest.mock import create_autospec
+
+import pytest
+
+from pyflexweb.database import FlexDatabase
+
+# Built once: autospeccing walks every FlexDatabase method, and the spec makes handler calls with
+# the wrong arguments fail instead of being silently accepted
+_DB_TEMPLATE = create_autospec(FlexDatabase, instance=True)
+
+
+@pytest.fixture
+def mock_db():
+    """A stand-in FlexDatabase with clean call history; configure return values per test."""
+    _DB_TEMPLATE.reset_mock(return_value=True, side_effect=True)
+    return _DB_TEMPLATE
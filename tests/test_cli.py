@@ -1,5 +1,6 @@
 """Tests for the CLI module."""
 
+import logging
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -13,7 +14,7 @@ class TestClickCli(unittest.TestCase):
 
     def setUp(self):
         self.runner = CliRunner()
-        self.mock_db_patcher = patch("pyflexweb.cli.FlexDatabase")
+        self.mock_db_patcher = patch("pyflexweb.database.FlexDatabase")
         self.mock_db_class = self.mock_db_patcher.start()
         self.mock_db = MagicMock()
         self.mock_db_class.return_value = self.mock_db
@@ -58,11 +59,20 @@ class TestClickCli(unittest.TestCase):
         self.assertEqual(result.exit_code, 0)
         self.assertIn("Download IBKR Flex reports", result.output)
 
+    def test_help_does_not_open_database(self):
+        """Test that help output never opens the database."""
+        for cli_args in (["--help"], ["token", "--help"], ["download", "--help"]):
+            result = self.runner.invoke(cli, cli_args)
+            self.assertEqual(result.exit_code, 0)
+        self.mock_db_class.assert_not_called()
+
     def test_no_command(self):
         """Test behavior when no command is provided."""
         result = self.runner.invoke(cli)
         self.assertEqual(result.exit_code, 1)  # Should exit with code 1
-        self.assertIn("Usage:", result.output)  # Should show help
+        self.assertIn("Usage:", result.output)  # Should show usage
+        self.assertNotIn("Commands:", result.output)  # Full help is only shown on a terminal
+        self.mock_db_class.assert_not_called()
 
     def test_token_set_command(self):
         """Test the token set command."""
@@ -177,11 +187,26 @@ class TestClickCli(unittest.TestCase):
         self.mock_query_handler.assert_called_once()
         args = self.mock_query_handler.call_args[0][0]
         self.assertEqual(args.subcommand, "list")  # Status should call query handler with 'list'
+        self.assertFalse(args.json_output)
 
     def test_download_command(self):
         """Test the download command with all options."""
         result = self.runner.invoke(
-            cli, ["download", "--query", "123456", "--output", "report.xml", "--poll-interval", "10", "--max-attempts", "30", "--force"]
+            cli,
+            [
+                "download",
+                "--query",
+                "123456",
+                "--output",
+                "report.xml",
+                "--poll-interval",
+                "10",
+                "--max-attempts",
+                "30",
+                "--max-concurrent",
+                "1",
+                "--force",
+            ],
         )
         self.assertEqual(result.exit_code, 0)
         self.mock_download_handler.assert_called_once()
@@ -190,6 +215,7 @@ class TestClickCli(unittest.TestCase):
         self.assertEqual(args.output, "report.xml")
         self.assertEqual(args.poll_interval, 10)
         self.assertEqual(args.max_attempts, 30)
+        self.assertEqual(args.max_concurrent, 1)
         self.assertTrue(args.force)
 
     def test_download_command_defaults(self):
@@ -201,9 +227,19 @@ class TestClickCli(unittest.TestCase):
         self.assertEqual(args.query, "all")  # Default value
         self.assertEqual(args.poll_interval, 30)  # Default value
         self.assertEqual(args.max_attempts, 20)  # Default value
+        self.assertEqual(args.max_concurrent, 2)  # Default value
         self.assertIsNone(args.output)  # Default is None
         self.assertFalse(args.force)  # Default is False
 
+    def test_download_progress_reaches_output(self):
+        """Progress logged by the handlers is printed when cli is invoked directly, once per line."""
+        self.mock_download_handler.side_effect = lambda args, db: logging.getLogger("pyflexweb.handlers").info("Polling...") or 0
+
+        for _ in range(2):
+            result = self.runner.invoke(cli, ["download"])
+            self.assertEqual(result.exit_code, 0)
+            self.assertEqual(result.output, "Polling...\n")
+
     def test_config_set_command(self):
         """Test the config set command."""
         result = self.runner.invoke(cli, ["config", "set", "default_poll_interval", "60"])
@@ -1,5 +1,8 @@
 """Tests for the IBKR Flex Web Service client."""
 
+import os
+import stat
+import tempfile
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -163,6 +166,118 @@ class TestIBKRFlexClient(unittest.TestCase):
                 # The exact error message will vary, just check that stderr.write was called
                 self.assertTrue(mock_stderr.write.called)
 
+    def _streaming_response(self, *chunks):
+        """Build a mock streaming response yielding the given byte chunks."""
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.iter_content.return_value = iter(chunks)
+        return mock_response
+
+    def test_save_report_streams_to_file(self):
+        """Test that a ready report is written to disk chunk by chunk."""
+        mock_response = self._streaming_response(b"<FlexQueryResponse>", b"XML report content", b"</FlexQueryResponse>")
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "report.xml")
+            with patch("pyflexweb.client.requests.get", return_value=mock_response) as mock_get:
+                self.assertTrue(self.client.save_report("REQ123", output_path))
+
+            self.assertTrue(mock_get.call_args.kwargs["stream"])
+            mock_response.iter_content.assert_called_once_with(chunk_size=IBKRFlexClient.CHUNK_SIZE)
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), b"<FlexQueryResponse>XML report content</FlexQueryResponse>")
+
+    @unittest.skipIf(os.name == "nt", "POSIX permissions only")
+    def test_save_report_respects_umask(self):
+        """Test that the saved report gets the umask-based permissions of a plainly opened file."""
+        mock_response = self._streaming_response(b"<FlexQueryResponse></FlexQueryResponse>")
+        previous_umask = os.umask(0o022)
+        try:
+            with tempfile.TemporaryDirectory() as temp_dir:
+                output_path = os.path.join(temp_dir, "report.xml")
+                with patch("pyflexweb.client.requests.get", return_value=mock_response):
+                    self.assertTrue(self.client.save_report("REQ123", output_path))
+                self.assertEqual(stat.S_IMODE(os.stat(output_path).st_mode), 0o644)
+        finally:
+            os.umask(previous_umask)
+
+    def test_save_report_interrupted_keeps_existing_file(self):
+        """Test that a connection dropped mid-stream leaves the previous report untouched."""
+
+        def chunks():
+            yield b"<FlexQueryResponse>partial"
+            raise requests.exceptions.ChunkedEncodingError("Connection broken")
+
+        mock_response = MagicMock()
+        mock_response.__enter__.return_value = mock_response
+        mock_response.iter_content.return_value = chunks()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "report.xml")
+            with open(output_path, "wb") as f:
+                f.write(b"<FlexQueryResponse>previous report</FlexQueryResponse>")
+
+            with patch("pyflexweb.client.requests.get", return_value=mock_response):
+                with patch("sys.stderr") as mock_stderr:
+                    self.assertFalse(self.client.save_report("REQ123", output_path))
+                    self.assertIn("Network error: Connection broken", "".join([call[0][0] for call in mock_stderr.write.call_args_list]))
+
+            with open(output_path, "rb") as f:
+                self.assertEqual(f.read(), b"<FlexQueryResponse>previous report</FlexQueryResponse>")
+            self.assertEqual(os.listdir(temp_dir), ["report.xml"])
+
+    def test_save_report_pending(self):
+        """Test that a pending status response is not written to disk."""
+        mock_response = self._streaming_response(
+            b"<FlexStatementResponse><Status>Pending</Status><ErrorCode>1019</ErrorCode>",
+            b"<ErrorMessage>Report not ready</ErrorMessage></FlexStatementResponse>",
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "report.xml")
+            with patch("pyflexweb.client.requests.get", return_value=mock_response):
+                with patch("sys.stderr") as mock_stderr:
+                    self.assertFalse(self.client.save_report("REQ123", output_path))
+                    mock_stderr.write.assert_not_called()
+            self.assertFalse(os.path.exists(output_path))
+
+    def test_save_report_pending_split_across_chunks(self):
+        """Test that a status document arriving in small pieces is still recognised and not written to disk."""
+        document = (
+            b'<?xml version="1.0" encoding="UTF-8"?>\n<FlexStatementResponse timestamp="15 October, 2026 09:00 AM EDT">'
+            b"<Status>Warn</Status><ErrorCode>1019</ErrorCode>"
+            b"<ErrorMessage>Statement generation in progress. Please try again shortly.</ErrorMessage></FlexStatementResponse>"
+        )
+        mock_response = self._streaming_response(*(document[i : i + 16] for i in range(0, len(document), 16)))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path = os.path.join(temp_dir, "report.xml")
+            with patch("pyflexweb.client.requests.get", return_value=mock_response):
+                with patch("sys.stderr"):
+                    self.assertFalse(self.client.save_report("REQ123", output_path))
+            self.assertEqual(os.listdir(temp_dir), [])
+
+    def test_save_report_error(self):
+        """Test that an error status response is reported and not written to disk."""
+        mock_response = self._streaming_response(
+            b"<FlexStatementResponse><Status>Failed</Status><ErrorCode>1234</ErrorCode>"
+            b"<ErrorMessage>Invalid request ID</ErrorMessage></FlexStatementResponse>"
+        )
+
+        with patch("pyflexweb.client.requests.get", return_value=mock_response):
+            with patch("sys.stderr") as mock_stderr:
+                self.assertFalse(self.client.save_report("REQ123", "unused.xml"))
+                self.assertIn(
+                    "Error retrieving report: Invalid request ID", "".join([call[0][0] for call in mock_stderr.write.call_args_list])
+                )
+
+    def test_save_report_network_error(self):
+        """Test saving a report with network error."""
+        with patch("pyflexweb.client.requests.get", side_effect=requests.exceptions.RequestException("Network error")):
+            with patch("sys.stderr") as mock_stderr:
+                self.assertFalse(self.client.save_report("REQ123", "unused.xml"))
+                self.assertIn("Network error: Network error", "".join([call[0][0] for call in mock_stderr.write.call_args_list]))
+
 
 if __name__ == "__main__":
     unittest.main()
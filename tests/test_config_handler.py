@@ -0,0 +1,115 @@
+"""Tests for the config command handler."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from pyflexweb.handlers import handle_config_command
+
+
+@pytest.mark.parametrize(
+    ("subcommand", "key", "value", "db_method", "db_return", "db_args", "expected_rc", "expected_msg"),
+    [
+        pytest.param(
+            "set",
+            "default_output_dir",
+            "/path/to/reports",
+            "set_config",
+            None,
+            ("default_output_dir", "/path/to/reports"),
+            0,
+            "Set default_output_dir = /path/to/reports",
+            id="set-string",
+        ),
+        pytest.param(
+            "set",
+            "default_poll_interval",
+            "60",
+            "set_config",
+            None,
+            ("default_poll_interval", "60"),
+            0,
+            "Set default_poll_interval = 60",
+            id="set-numeric",
+        ),
+        pytest.param(
+            "set",
+            "default_poll_interval",
+            "not_a_number",
+            "set_config",
+            None,
+            None,
+            1,
+            "Error: default_poll_interval must be a number",
+            id="set-invalid-numeric",
+        ),
+        pytest.param(
+            "get", "default_poll_interval", None, "get_config", "60", ("default_poll_interval",), 0, "default_poll_interval = 60", id="get"
+        ),
+        pytest.param(
+            "get", "nonexistent_key", None, "get_config", None, ("nonexistent_key",), 0, "nonexistent_key is not set", id="get-missing"
+        ),
+        pytest.param("get", None, None, "list_config", {}, (), 0, "No configuration values set", id="get-all-empty"),
+        pytest.param(
+            "unset",
+            "default_poll_interval",
+            None,
+            "unset_config",
+            True,
+            ("default_poll_interval",),
+            0,
+            "Unset default_poll_interval",
+            id="unset",
+        ),
+        pytest.param(
+            "unset",
+            "nonexistent_key",
+            None,
+            "unset_config",
+            False,
+            ("nonexistent_key",),
+            0,
+            "nonexistent_key was not set",
+            id="unset-missing",
+        ),
+        pytest.param("invalid", None, None, None, None, None, 1, "Missing subcommand. Use 'set', 'get', 'unset', or 'list'.", id="invalid"),
+    ],
+)
+def test_config_command(mock_db, capsys, subcommand, key, value, db_method, db_return, db_args, expected_rc, expected_msg):
+    """Config subcommands that print a single message; db_args of None means the method must not be called."""
+    args = MagicMock(subcommand=subcommand, key=key, value=value)
+    if db_method:
+        getattr(mock_db, db_method).return_value = db_return
+
+    assert handle_config_command(args, mock_db) == expected_rc
+    if db_method and db_args is None:
+        getattr(mock_db, db_method).assert_not_called()
+    elif db_method:
+        getattr(mock_db, db_method).assert_called_once_with(*db_args)
+    assert capsys.readouterr().out == expected_msg + "\n"
+
+
+def test_config_get_all_values(mock_db, capsys):
+    """Test getting all config values."""
+    args = MagicMock(subcommand="get", key=None)
+    mock_db.list_config.return_value = {"default_poll_interval": "60", "default_output_dir": "/path/to/reports"}
+
+    result = handle_config_command(args, mock_db)
+    assert result == 0
+    mock_db.list_config.assert_called_once()
+    assert capsys.readouterr().out.splitlines() == ["default_poll_interval = 60", "default_output_dir = /path/to/reports"]
+
+
+def test_config_list_command(mock_db, capsys):
+    """Test the list subcommand."""
+    args = MagicMock(subcommand="list", key=None)
+    mock_db.list_config.return_value = {"default_poll_interval": "60", "default_max_attempts": "15"}
+
+    result = handle_config_command(args, mock_db)
+    assert result == 0
+    mock_db.list_config.assert_called_once()
+    lines = capsys.readouterr().out.splitlines()
+    assert "Configuration settings:" in lines
+    assert any("* indicates non-default value" in line for line in lines)
+    assert "* default_poll_interval = 60" in lines
+    assert "  activity: 6h" in lines
@@ -6,7 +6,7 @@ import sqlite3
 import tempfile
 import unittest
 from datetime import datetime, timedelta
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 from pyflexweb.database import FlexDatabase
 
@@ -30,6 +30,16 @@ class TestFlexDatabase(unittest.TestCase):
         if os.path.exists(self.temp_db_dir):
             shutil.rmtree(self.temp_db_dir)
 
+    def _set_request_times(self, request_id, requested_at=None, completed_at=None):
+        """Backdate a request's timestamps (completed_at also sets last_updated)."""
+        if requested_at is not None:
+            self.db.conn.execute("UPDATE requests SET requested_at = ? WHERE request_id = ?", (requested_at.isoformat(), request_id))
+        if completed_at is not None:
+            self.db.conn.execute(
+                "UPDATE requests SET completed_at = ?1, last_updated = ?1 WHERE request_id = ?2", (completed_at.isoformat(), request_id)
+            )
+        self.db.conn.commit()
+
     def test_get_db_path(self):
         db_path = self.db.get_db_path()
         self.assertEqual(db_path, os.path.join(self.temp_db_dir, "status.db"))
@@ -47,13 +57,13 @@ class TestFlexDatabase(unittest.TestCase):
         self.db.add_query("123456", "Test Query")
         query_info = self.db.get_query_info("123456")
         self.assertIsNotNone(query_info)
-        self.assertEqual(query_info["id"], "123456")
-        self.assertEqual(query_info["name"], "Test Query")
-        self.assertEqual(query_info["type"], "activity")
+        self.assertEqual(query_info.id, "123456")
+        self.assertEqual(query_info.name, "Test Query")
+        self.assertEqual(query_info.type, "activity")
 
         self.assertTrue(self.db.rename_query("123456", "Renamed Query"))
         query_info = self.db.get_query_info("123456")
-        self.assertEqual(query_info["name"], "Renamed Query")
+        self.assertEqual(query_info.name, "Renamed Query")
 
         self.assertFalse(self.db.rename_query("999999", "Should Not Work"))
         self.assertTrue(self.db.remove_query("123456"))
@@ -65,23 +75,33 @@ class TestFlexDatabase(unittest.TestCase):
         self.db.add_query("222", "Trade Conf", query_type="trade-confirmation")
 
         q1 = self.db.get_query_info("111")
-        self.assertEqual(q1["type"], "activity")
+        self.assertEqual(q1.type, "activity")
 
         q2 = self.db.get_query_info("222")
-        self.assertEqual(q2["type"], "trade-confirmation")
+        self.assertEqual(q2.type, "trade-confirmation")
 
     def test_query_with_min_interval(self):
         self.db.add_query("111", "Custom Interval", min_interval=12)
         q = self.db.get_query_info("111")
-        self.assertEqual(q["min_interval"], 12)
+        self.assertEqual(q.min_interval, 12)
 
         self.db.set_query_interval("111", 24)
         q = self.db.get_query_info("111")
-        self.assertEqual(q["min_interval"], 24)
+        self.assertEqual(q.min_interval, 24)
 
         self.db.set_query_interval("111", None)
         q = self.db.get_query_info("111")
-        self.assertIsNone(q["min_interval"])
+        self.assertIsNone(q.min_interval)
+
+    def test_query_info_cache_invalidation(self):
+        self.assertIsNone(self.db.get_query_info("111"))
+        self.db.add_query("111", "Added Later", query_type="trade-confirmation")
+        self.assertEqual(self.db.get_query_info("111").name, "Added Later")
+
+        self.db.get_all_queries_with_status()
+        self.db.set_query_interval("111", 3)
+        self.assertEqual(self.db.get_query_info("111").min_interval, 3)
+        self.assertEqual(self.db.get_query_info("111").type, "trade-confirmation")
 
     def test_list_queries(self):
         self.db.add_query("111", "First Query")
@@ -95,95 +115,154 @@ class TestFlexDatabase(unittest.TestCase):
 
     def test_request_operations(self):
         self.db.add_query("123456", "Test Query")
-        self.db.add_request("REQ123", "123456")
+        self.db.record_request_outcome("REQ123", "123456", "completed", "2025-04-12T10:00:00.000", "output.xml")
 
         request_info = self.db.get_request_info("REQ123")
         self.assertIsNotNone(request_info)
-        self.assertEqual(request_info["request_id"], "REQ123")
-        self.assertEqual(request_info["query_id"], "123456")
-        self.assertEqual(request_info["status"], "pending")
+        self.assertEqual(request_info.request_id, "REQ123")
+        self.assertEqual(request_info.query_id, "123456")
+        self.assertEqual(request_info.status, "completed")
+        self.assertEqual(request_info.requested_at, "2025-04-12T10:00:00.000")
+        self.assertEqual(request_info.output_path, "output.xml")
+        completed_at = datetime.fromisoformat(request_info.completed_at)
+        self.assertLess(abs(datetime.now() - completed_at), timedelta(minutes=1))
+
+    def test_record_request_outcome_failed(self):
+        self.db.add_query("111", "First Query")
+        self.db.record_request_outcome("REQ1", "111", "failed", "2025-04-12T10:00:00.000", "ignored.xml")
 
-        self.db.update_request_status("REQ123", "completed", "output.xml")
-        request_info = self.db.get_request_info("REQ123")
-        self.assertEqual(request_info["status"], "completed")
-        self.assertEqual(request_info["output_path"], "output.xml")
-        self.assertIsNotNone(request_info["completed_at"])
+        failed = self.db.get_request_info("REQ1")
+        self.assertEqual(failed.status, "failed")
+        self.assertIsNone(failed.output_path)
+        self.assertIsNone(failed.completed_at)
+
+    def test_record_request_outcome_updates_existing_row(self):
+        self.db.add_query("111", "First Query")
+        self.db.record_request_outcome("REQ1", "111", "completed", "2025-04-12T10:00:00.000", "output.xml")
+        completed_at = self.db.get_request_info("REQ1").completed_at
+
+        self.db.record_request_outcome("REQ1", "111", "failed", "2025-04-12T11:00:00.000")
+
+        # Recording the same request again updates its status but keeps the original times and file
+        request_info = self.db.get_request_info("REQ1")
+        self.assertEqual(request_info.status, "failed")
+        self.assertEqual(request_info.requested_at, "2025-04-12T10:00:00.000")
+        self.assertEqual(request_info.completed_at, completed_at)
+        self.assertEqual(request_info.output_path, "output.xml")
 
     def test_get_latest_request(self):
         self.db.add_query("123456", "Test Query")
         self.assertIsNone(self.db.get_latest_request("123456"))
 
-        with patch("pyflexweb.database.datetime", autospec=True) as mock_datetime:
-            mock_datetime.now.return_value = datetime(2025, 4, 12, 10, 0, 0)
-            mock_datetime.isoformat = datetime.isoformat
-            self.db.add_request("REQ1", "123456")
+        self.db.record_request_outcome("REQ1", "123456", "failed", "2025-04-12T09:00:00.000")
+        self.db.record_request_outcome("REQ2", "123456", "failed", "2025-04-12T09:00:00.000")
+        self.assertEqual(self.db.get_latest_request("123456").request_id, "REQ2")
 
-            mock_datetime.now.return_value = datetime(2025, 4, 12, 10, 1, 0)
-            self.db.add_request("REQ2", "123456")
+        self._set_request_times("REQ1", requested_at=datetime(2025, 4, 12, 10, 1, 0))
+        self._set_request_times("REQ2", requested_at=datetime(2025, 4, 12, 10, 0, 0))
 
         latest = self.db.get_latest_request("123456")
         self.assertIsNotNone(latest)
-        self.assertEqual(latest["request_id"], "REQ2")
+        self.assertEqual(latest.request_id, "REQ1")
 
     def test_get_queries_needing_download(self):
         self.db.add_query("111", "Activity", query_type="activity")
         self.db.add_query("222", "Trade Conf", query_type="trade-confirmation")
         self.db.add_query("333", "Never Downloaded")
 
-        old_time = datetime.now() - timedelta(hours=48)
-        recent_time = datetime.now() - timedelta(minutes=30)
-        current_time = datetime.now()
-
-        with patch("pyflexweb.database.datetime", autospec=True) as mock_datetime:
-            mock_datetime.now.side_effect = [
-                old_time,
-                old_time,  # add + update REQ1 (activity, 48h ago)
-                recent_time,
-                recent_time,  # add + update REQ2 (trade-conf, 30min ago)
-                current_time,
-                current_time,
-                current_time,  # get_queries_needing_download (per query)
-            ]
-            mock_datetime.isoformat = datetime.isoformat
+        self.db.record_request_outcome("REQ1", "111", "completed", "2025-04-12T10:00:00.000", "output.xml")
+        self._set_request_times("REQ1", completed_at=datetime.now() - timedelta(hours=48))
 
-            self.db.add_request("REQ1", "111")
-            self.db.update_request_status("REQ1", "completed", "output.xml")
+        self.db.record_request_outcome("REQ2", "222", "completed", "2025-04-12T10:00:00.000", "output2.xml")
+        self._set_request_times("REQ2", completed_at=datetime.now() - timedelta(minutes=30))
 
-            self.db.add_request("REQ2", "222")
-            self.db.update_request_status("REQ2", "completed", "output2.xml")
-
-            type_defaults = {"activity": 6, "trade-confirmation": 1}
-            queries = self.db.get_queries_needing_download(type_defaults)
+        type_defaults = {"activity": 6, "trade-confirmation": 1}
+        queries = self.db.get_queries_needing_download(type_defaults)
 
         # 111: activity, 48h ago → needs download (> 6h)
         # 222: trade-conf, 30min ago → up to date (< 1h)
         # 333: never downloaded → needs download
-        query_ids = [q["id"] for q in queries]
+        query_ids = [q.id for q in queries]
         self.assertEqual(len(queries), 2)
         self.assertIn("111", query_ids)
         self.assertIn("333", query_ids)
         self.assertNotIn("222", query_ids)
 
+    def test_get_queries_needing_download_min_interval_override(self):
+        self.db.add_query("111", "Hourly Activity", query_type="activity", min_interval=1)
+        self.db.record_request_outcome("REQ1", "111", "completed", "2025-04-12T10:00:00.000", "output.xml")
+
+        type_defaults = {"activity": 6, "trade-confirmation": 1}
+        self.assertEqual(self.db.get_queries_needing_download(type_defaults), [])
+
+        self._set_request_times("REQ1", completed_at=datetime.now() - timedelta(hours=2))
+        queries = self.db.get_queries_needing_download(type_defaults)
+        self.assertEqual([q.id for q in queries], ["111"])
+
     def test_get_all_queries_with_status(self):
         self.db.add_query("111", "First Query")
         self.db.add_query("222", "Second Query", query_type="trade-confirmation")
 
-        self.db.add_request("REQ1", "111")
-        self.db.update_request_status("REQ1", "completed", "output.xml")
+        self.db.record_request_outcome("REQ1", "111", "completed", "2025-04-12T10:00:00.000", "output.xml")
 
         queries = self.db.get_all_queries_with_status()
         self.assertEqual(len(queries), 2)
 
-        q111 = next(q for q in queries if q["id"] == "111")
-        self.assertEqual(q111["name"], "First Query")
-        self.assertEqual(q111["type"], "activity")
-        self.assertIsNotNone(q111["latest_request"])
-        self.assertEqual(q111["latest_request"]["status"], "completed")
+        q111 = next(q for q in queries if q.id == "111")
+        self.assertEqual(q111.name, "First Query")
+        self.assertEqual(q111.type, "activity")
+        self.assertIsNotNone(q111.latest_request)
+        self.assertEqual(q111.latest_request.status, "completed")
+
+        q222 = next(q for q in queries if q.id == "222")
+        self.assertEqual(q222.name, "Second Query")
+        self.assertEqual(q222.type, "trade-confirmation")
+        self.assertIsNone(q222.latest_request)
+
+    def test_connection_pragmas(self):
+        cursor = self.db.conn.cursor()
+        self.assertEqual(cursor.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(cursor.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+
+    def test_request_indexes_created(self):
+        cursor = self.db.conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'requests'")
+        index_names = {row[0] for row in cursor.fetchall()}
+        self.assertIn("idx_requests_query_time", index_names)
+        self.assertIn("idx_requests_status", index_names)
+
+    def test_migration_from_legacy_schema(self):
+        legacy_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, legacy_dir)
+        conn = sqlite3.connect(os.path.join(legacy_dir, "status.db"))
+        conn.execute("CREATE TABLE config (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute("CREATE TABLE queries (id TEXT PRIMARY KEY, name TEXT, report_type TEXT)")
+        conn.execute(
+            "CREATE TABLE requests (request_id TEXT PRIMARY KEY, query_id TEXT, status TEXT, "
+            "requested_at DATETIME, completed_at DATETIME, output_path TEXT)"
+        )
+        conn.executemany("INSERT INTO queries VALUES (?, ?, ?)", [("111", "First", "activity"), ("222", "Second", "trade")])
+        conn.commit()
+        conn.close()
+
+        db = FlexDatabase(legacy_dir)
+        try:
+            self.assertEqual(db.list_queries(), [("111", "First"), ("222", "Second")])
+            self.assertEqual(db.get_query_info("222").type, "activity")
+            self.assertEqual(db.conn.execute("PRAGMA user_version").fetchone()[0], FlexDatabase.DB_VERSION)
+            self.assertFalse(db.conn.in_transaction)
+        finally:
+            db.close()
+
+    def test_migration_promotes_config_db_version(self):
+        self.db.conn.execute("PRAGMA user_version = 0")
+        self.db.conn.execute("INSERT INTO config VALUES ('db_version', ?)", (str(FlexDatabase.DB_VERSION),))
+        self.db.conn.commit()
+        self.db.close()
 
-        q222 = next(q for q in queries if q["id"] == "222")
-        self.assertEqual(q222["name"], "Second Query")
-        self.assertEqual(q222["type"], "trade-confirmation")
-        self.assertIsNone(q222["latest_request"])
+        self.db = FlexDatabase(self.temp_db_dir)
+        self.assertEqual(self.db.conn.execute("PRAGMA user_version").fetchone()[0], FlexDatabase.DB_VERSION)
+        self.assertIsNone(self.db.get_config("db_version"))
 
     def test_database_close(self):
         self.db.close()
@@ -212,6 +291,33 @@ class TestFlexDatabase(unittest.TestCase):
         self.assertNotIn("test_key", config_dict)
         self.assertIn("default_poll_interval", config_dict)
 
+    def test_config_cache_matches_database(self):
+        self.db.set_token("cached_token")
+        self.db.set_config("default_poll_interval", "60")
+        self.assertEqual(self.db.get_config("default_poll_interval"), "60")
+        self.db.unset_config("default_poll_interval")
+
+        other = FlexDatabase(self.temp_db_dir)
+        try:
+            self.assertEqual(other.get_token(), "cached_token")
+            self.assertIsNone(other.get_config("default_poll_interval"))
+        finally:
+            other.close()
+
+    def test_unchanged_writes_skip_commit(self):
+        self.db.set_config("default_poll_interval", "60")
+        self.db.add_query("123456", "Test Query")
+        self.db.get_query_info("123456")
+
+        self.db.conn = MagicMock(wraps=self.db.conn)
+        self.db.set_config("default_poll_interval", "60")
+        self.assertTrue(self.db.rename_query("123456", "Test Query"))
+        self.db.conn.execute.assert_not_called()
+        self.db.conn.commit.assert_not_called()
+
+        self.db.set_config("default_poll_interval", "90")
+        self.db.conn.commit.assert_called_once()
+
 
 if __name__ == "__main__":
     unittest.main()
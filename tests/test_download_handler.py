@@ -0,0 +1,266 @@
+"""Tests for the download command handler."""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+
+from pyflexweb.database import Query, QueryStatus, Request
+from pyflexweb.handlers import TYPE_INTERVAL_DEFAULTS, handle_download_command
+
+
+@pytest.fixture(autouse=True)
+def patch_client_and_sleep(mocker):
+    """Replace the IBKR client with a mock and make polling waits return immediately."""
+    client_cls = mocker.patch("pyflexweb.client.IBKRFlexClient")
+    client = MagicMock()
+    client_cls.return_value = client
+    mocker.patch("asyncio.sleep")
+    return client_cls, client
+
+
+def test_download_no_token(mock_db, capsys, patch_client_and_sleep):
+    """Test download with no token."""
+    client_cls, _ = patch_client_and_sleep
+    args = MagicMock(query="123456")
+    mock_db.get_token.return_value = None
+
+    result = handle_download_command(args, mock_db)
+    assert result == 1
+    mock_db.get_token.assert_called_once()
+    client_cls.assert_not_called()
+    assert capsys.readouterr().out == "No token found. Set one with 'pyflexweb token set <token>'\n"
+
+
+def test_download_all_queries_up_to_date(mock_db, capsys):
+    """Test download all when all queries are up to date."""
+    args = MagicMock(query="all", force=False, output=None, output_dir=None)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_queries_needing_download.return_value = []
+
+    result = handle_download_command(args, mock_db)
+    assert result == 0
+    mock_db.get_token.assert_called_once()
+    mock_db.get_queries_needing_download.assert_called_once_with(TYPE_INTERVAL_DEFAULTS)
+    assert "All queries are up to date. Use --force to download anyway." in capsys.readouterr().out.splitlines()
+
+
+def test_download_all_uses_sql_filter_only(mock_db, patch_client_and_sleep):
+    """Queries returned by get_queries_needing_download are downloaded without a second interval check."""
+    _, client = patch_client_and_sleep
+    args = MagicMock(query="all", force=False, output=None, output_dir=".", max_attempts=1, poll_interval=1, max_concurrent=2)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_queries_needing_download.return_value = [Query("111", "Activity", "activity", None)]
+    client.request_report.return_value = "REQ1"
+    client.save_report.return_value = True
+
+    result = handle_download_command(args, mock_db)
+
+    assert result == 0
+    mock_db.get_latest_request.assert_not_called()
+    client.request_report.assert_called_once_with("111")
+
+
+def test_download_specific_query_not_found(mock_db, capsys):
+    """Test download specific query that doesn't exist."""
+    args = MagicMock(query="123456", output=None, output_dir=None)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_query_info.return_value = None
+
+    result = handle_download_command(args, mock_db)
+    assert result == 1
+    mock_db.get_token.assert_called_once()
+    mock_db.get_query_info.assert_called_once_with("123456")
+    assert capsys.readouterr().out == "Query ID 123456 not found. Add it with 'pyflexweb query add 123456'\n"
+
+
+def test_download_already_downloaded_within_interval(mock_db, mocker, caplog, patch_client_and_sleep):
+    """Test download when report was already downloaded within min interval."""
+    client_cls, _ = patch_client_and_sleep
+    args = MagicMock(query="123456", force=False, output=None, output_dir=None)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_query_info.return_value = Query("123456", "Test Query", "activity", None)
+
+    now = datetime(2025, 1, 1)
+    mock_db.get_latest_request.return_value = Request(
+        "REQ0", "123456", "completed", now.isoformat(), now.isoformat(), "previous_download.xml"
+    )
+
+    caplog.set_level(logging.INFO, logger="pyflexweb")
+    mock_datetime = mocker.patch("pyflexweb.handlers.datetime")
+    mock_datetime.now.return_value = now
+
+    result = handle_download_command(args, mock_db)
+    assert result == 0
+
+    mock_db.get_token.assert_called_once()
+    mock_db.get_query_info.assert_called_once_with("123456")
+    mock_db.get_latest_request.assert_called_once_with("123456")
+
+    client_cls.assert_not_called()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert "  Skipped: downloaded within the last 6h." in messages
+    assert "  Output file: previous_download.xml" in messages
+    assert "  Use --force to download again." in messages
+
+
+def test_download_force_success(mock_db, patch_client_and_sleep):
+    """Test forced download with successful outcome."""
+    _, client = patch_client_and_sleep
+    args = MagicMock(
+        query="123456", force=True, output="forced_download.xml", output_dir=None, max_attempts=1, poll_interval=1, max_concurrent=2
+    )
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_query_info.return_value = Query("123456", "Test Query", "activity", None)
+
+    client.request_report.return_value = "REQ123"
+    client.save_report.return_value = True
+
+    result = handle_download_command(args, mock_db)
+    assert result == 0
+
+    mock_db.get_token.assert_called_once()
+    client.request_report.assert_called_once_with("123456")
+    client.save_report.assert_called_once_with("REQ123", "./forced_download.xml")  # the client streams the report to disk itself
+
+    mock_db.record_request_outcome.assert_called_once()
+    request_id, query_id, status, requested_at, output_path = mock_db.record_request_outcome.call_args[0]
+    assert (request_id, query_id, status, output_path) == ("REQ123", "123456", "completed", "./forced_download.xml")
+    datetime.fromisoformat(requested_at)
+
+
+def test_download_all_force(mock_db, patch_client_and_sleep):
+    """Test forced download of all queries."""
+    _, client = patch_client_and_sleep
+    args = MagicMock(query="all", force=True, output=None, output_dir=".", max_attempts=1, poll_interval=1, max_concurrent=2)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_all_queries_with_status.return_value = [
+        QueryStatus("111", "Activity", "activity", None),
+        QueryStatus("222", "Trade", "trade-confirmation", None),
+    ]
+
+    client.request_report.return_value = "REQ1"
+    client.save_report.return_value = True
+
+    result = handle_download_command(args, mock_db)
+    assert result == 0
+    mock_db.get_all_queries_with_status.assert_called_once()
+    assert client.request_report.call_count == 2
+    assert mock_db.record_request_outcome.call_count == 2
+
+
+def test_download_all_concurrent_mixed_results(mock_db, mocker, caplog, patch_client_and_sleep):
+    """One failing query does not stop the others, and every outcome is recorded."""
+    _, client = patch_client_and_sleep
+    args = MagicMock(query="all", force=True, output=None, output_dir=".", max_attempts=2, poll_interval=1, max_concurrent=2)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_all_queries_with_status.return_value = [
+        QueryStatus("111", "Activity", "activity", None),
+        QueryStatus("222", "Trade", "trade-confirmation", None),
+        QueryStatus("333", "Broken", "activity", None),
+    ]
+
+    def request_report(query_id):
+        if query_id == "333":
+            raise RuntimeError("boom")
+        return f"REQ{query_id}"
+
+    client.request_report.side_effect = request_report
+    client.save_report.side_effect = lambda request_id, output_file: request_id != "REQ222"
+    mocker.patch("pyflexweb.handlers.datetime").now.return_value = datetime(2025, 1, 1)
+
+    caplog.set_level(logging.INFO, logger="pyflexweb")
+    result = handle_download_command(args, mock_db)
+
+    assert result == 1
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Error downloading 333: boom" in messages
+    assert "  [222] Report not available after 2 attempts." in messages
+    recorded = sorted(c.args for c in mock_db.record_request_outcome.call_args_list)
+    assert recorded == [
+        ("REQ111", "111", "completed", "2025-01-01T00:00:00.000", "./Activity_20250101.xml"),
+        ("REQ222", "222", "failed", "2025-01-01T00:00:00.000"),
+    ]
+
+
+def test_download_all_records_each_outcome_as_it_finishes(mock_db, patch_client_and_sleep):
+    """A finished download is written to the database while slower ones are still polling."""
+    _, client = patch_client_and_sleep
+    args = MagicMock(query="all", force=True, output=None, output_dir=".", max_attempts=1, poll_interval=1, max_concurrent=2)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_all_queries_with_status.return_value = [
+        QueryStatus("111", "Fast", "activity", None),
+        QueryStatus("222", "Slow", "activity", None),
+    ]
+    client.request_report.side_effect = lambda query_id: f"REQ{query_id}"
+
+    fast_recorded = threading.Event()
+    mock_db.record_request_outcome.side_effect = lambda request_id, *rest: request_id == "REQ111" and fast_recorded.set()
+
+    def save_report(request_id, output_file):
+        # The slow report only becomes ready once the fast one has been recorded
+        return request_id == "REQ111" or fast_recorded.wait(timeout=5)
+
+    client.save_report.side_effect = save_report
+
+    assert handle_download_command(args, mock_db) == 0
+    assert [c.args[0] for c in mock_db.record_request_outcome.call_args_list] == ["REQ111", "REQ222"]
+
+
+def test_download_all_limits_concurrent_ibkr_calls(mock_db, patch_client_and_sleep):
+    """No more than max_concurrent calls to IBKR, report requests and polls together, are in flight at the same time."""
+    _, client = patch_client_and_sleep
+    args = MagicMock(query="all", force=True, output=None, output_dir=".", max_attempts=1, poll_interval=1, max_concurrent=2)
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_all_queries_with_status.return_value = [QueryStatus(str(i), f"Query {i}", "activity", None) for i in range(5)]
+
+    lock = threading.Lock()
+    in_flight = peak = 0
+
+    def ibkr_call(result):
+        def call(*args):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            time.sleep(0.02)  # hold the call open long enough for the others to pile up
+            with lock:
+                in_flight -= 1
+            return result(*args)
+
+        return call
+
+    client.request_report.side_effect = ibkr_call(lambda query_id: f"REQ{query_id}")
+    client.save_report.side_effect = ibkr_call(lambda request_id, output_file: True)
+
+    assert handle_download_command(args, mock_db) == 0
+    assert client.request_report.call_count == 5
+    assert client.save_report.call_count == 5
+    assert peak <= 2
+
+
+def test_download_creates_output_dir_once(mock_db, capsys, tmp_path, patch_client_and_sleep):
+    """The output directory is created when missing and silently reused when present."""
+    _, client = patch_client_and_sleep
+    mock_db.get_token.return_value = "test_token"
+    mock_db.get_query_info.return_value = Query("123456", "Test Query", "activity", None)
+    client.request_report.return_value = "REQ123"
+    client.save_report.return_value = True
+
+    output_dir = str(tmp_path / "reports")
+    args = MagicMock(query="123456", force=True, output="r.xml", output_dir=output_dir, max_attempts=1, poll_interval=1, max_concurrent=2)
+    created = f"Created output directory: {output_dir}"
+
+    assert handle_download_command(args, mock_db) == 0
+    assert created in capsys.readouterr().out.splitlines()
+
+    assert handle_download_command(args, mock_db) == 0
+    assert created not in capsys.readouterr().out.splitlines()
+
+    assert os.path.isdir(output_dir)
+    client.save_report.assert_called_with("REQ123", os.path.join(output_dir, "r.xml"))
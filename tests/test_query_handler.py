@@ -0,0 +1,230 @@
+"""Tests for the query command handler."""
+
+import json
+from unittest.mock import MagicMock
+
+from pyflexweb.database import Query, QueryStatus, Request
+from pyflexweb.handlers import handle_query_command
+
+# A fixed timestamp keeps the fixtures deterministic instead of depending on the wall clock
+_FIXED_NOW_ISO = "2025-01-01T00:00:00"
+
+
+def test_query_add(mock_db, capsys):
+    """Test adding a query."""
+    args = MagicMock()
+    args.subcommand = "add"
+    args.query_id = "123456"
+    args.name = "Test Query"
+    args.query_type = "activity"
+    args.min_interval = None
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.add_query.assert_called_once_with("123456", "Test Query", query_type="activity", min_interval=None)
+    assert capsys.readouterr().out == "Query ID 123456 added (activity).\n"
+
+
+def test_query_add_trade_confirmation(mock_db, capsys):
+    """Test adding a trade-confirmation query."""
+    args = MagicMock()
+    args.subcommand = "add"
+    args.query_id = "789"
+    args.name = "Trade Conf"
+    args.query_type = "trade-confirmation"
+    args.min_interval = None
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.add_query.assert_called_once_with("789", "Trade Conf", query_type="trade-confirmation", min_interval=None)
+    assert capsys.readouterr().out == "Query ID 789 added (trade-confirmation).\n"
+
+
+def test_query_add_with_interval(mock_db, capsys):
+    """Test adding a query with custom min interval."""
+    args = MagicMock()
+    args.subcommand = "add"
+    args.query_id = "123456"
+    args.name = "Custom"
+    args.query_type = "activity"
+    args.min_interval = 12
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.add_query.assert_called_once_with("123456", "Custom", query_type="activity", min_interval=12)
+    assert capsys.readouterr().out == "Query ID 123456 added (activity). Min interval: 12h.\n"
+
+
+def test_query_remove_success(mock_db, capsys):
+    """Test removing a query that exists."""
+    args = MagicMock(subcommand="remove", query_id="123456")
+    mock_db.remove_query.return_value = True
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.remove_query.assert_called_once_with("123456")
+    assert capsys.readouterr().out == "Query ID 123456 removed.\n"
+
+
+def test_query_remove_not_found(mock_db, capsys):
+    """Test removing a query that does not exist."""
+    args = MagicMock(subcommand="remove", query_id="123456")
+    mock_db.remove_query.return_value = False
+
+    result = handle_query_command(args, mock_db)
+    assert result == 1
+    mock_db.remove_query.assert_called_once_with("123456")
+    assert capsys.readouterr().out == "Query ID 123456 not found.\n"
+
+
+def test_query_rename_success(mock_db, capsys):
+    """Test renaming a query that exists."""
+    args = MagicMock()
+    args.subcommand = "rename"
+    args.query_id = "123456"
+    args.name = "New Name"
+
+    mock_db.rename_query.return_value = True
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.rename_query.assert_called_once_with("123456", "New Name")
+    assert capsys.readouterr().out == "Query ID 123456 renamed to 'New Name'.\n"
+
+
+def test_query_rename_not_found(mock_db, capsys):
+    """Test renaming a query that does not exist."""
+    args = MagicMock()
+    args.subcommand = "rename"
+    args.query_id = "123456"
+    args.name = "New Name"
+
+    mock_db.rename_query.return_value = False
+
+    result = handle_query_command(args, mock_db)
+    assert result == 1
+    mock_db.rename_query.assert_called_once_with("123456", "New Name")
+    assert capsys.readouterr().out == "Query ID 123456 not found.\n"
+
+
+def test_query_interval_set(mock_db, capsys):
+    """Test setting a query interval."""
+    args = MagicMock()
+    args.subcommand = "interval"
+    args.query_id = "123456"
+    args.hours = 12
+    args.unset = False
+
+    mock_db.get_query_info.return_value = Query("123456", "Test", "activity", None)
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.set_query_interval.assert_called_once_with("123456", 12)
+    assert capsys.readouterr().out == "Query 123456 min interval set to 12h.\n"
+
+
+def test_query_interval_unset(mock_db, capsys):
+    """Test unsetting a query interval."""
+    args = MagicMock()
+    args.subcommand = "interval"
+    args.query_id = "123456"
+    args.hours = None
+    args.unset = True
+
+    mock_db.get_query_info.return_value = Query("123456", "Test", "activity", 12)
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.set_query_interval.assert_called_once_with("123456", None)
+    assert capsys.readouterr().out == "Query 123456 will use the type default (6h).\n"
+
+
+def test_query_interval_not_found(mock_db, capsys):
+    """Test setting interval for a non-existent query."""
+    args = MagicMock()
+    args.subcommand = "interval"
+    args.query_id = "999"
+    args.hours = 12
+    args.unset = False
+
+    mock_db.get_query_info.return_value = None
+
+    result = handle_query_command(args, mock_db)
+    assert result == 1
+    assert capsys.readouterr().out == "Query ID 999 not found.\n"
+
+
+def test_query_list_with_queries(mock_db, capsys):
+    """Test listing queries when some exist."""
+    args = MagicMock(subcommand="list", json_output=False)
+    query1 = QueryStatus(
+        "123456",
+        "Test Query",
+        "activity",
+        None,
+        Request("REQ1", "123456", "completed", _FIXED_NOW_ISO, _FIXED_NOW_ISO, None),
+    )
+    query2 = QueryStatus("789012", "Another Query", "trade-confirmation", 2)
+    mock_db.get_all_queries_with_status.return_value = [query1, query2]
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.get_all_queries_with_status.assert_called_once()
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 4  # Header + separator + 2 queries
+    assert lines[2].startswith("123456     Test Query")
+    assert query1.latest_request.completed_at[:10] in lines[2]
+    assert "2h" in lines[3]
+    assert "Never" in lines[3]
+
+
+def test_query_list_no_queries(mock_db, capsys):
+    """Test listing queries when none exist."""
+    args = MagicMock(subcommand="list", json_output=False)
+    mock_db.get_all_queries_with_status.return_value = []
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    mock_db.get_all_queries_with_status.assert_called_once()
+    assert capsys.readouterr().out == "No query IDs found. Add one with 'pyflexweb query add <query_id> --name \"Query name\"'\n"
+
+
+def test_query_list_json_output(mock_db, capsys):
+    """Test listing queries in JSON format."""
+    args = MagicMock(subcommand="list", json_output=True)
+    query1 = QueryStatus(
+        "123456",
+        "Test Query",
+        "activity",
+        None,
+        Request("REQ1", "123456", "completed", "2025-04-12T09:55:00", "2025-04-12T10:00:00", "output.xml"),
+    )
+    mock_db.get_all_queries_with_status.return_value = [query1]
+
+    result = handle_query_command(args, mock_db)
+    assert result == 0
+    output = json.loads(capsys.readouterr().out)
+    assert len(output) == 1
+    assert output[0]["id"] == "123456"
+    assert output[0]["type"] == "activity"
+    assert output[0]["effective_interval"] == 6
+
+
+def test_query_list_json_output_keeps_non_ascii(mock_db, capsys):
+    """Non-ASCII query names are written as UTF-8 text rather than \\u escapes."""
+    args = MagicMock(subcommand="list", json_output=True)
+    mock_db.get_all_queries_with_status.return_value = [QueryStatus("123456", "Relevé d'activité", "activity", None)]
+
+    assert handle_query_command(args, mock_db) == 0
+    output = capsys.readouterr().out
+    assert '"Relevé d\'activité"' in output
+    assert json.loads(output)[0]["name"] == "Relevé d'activité"
+
+
+def test_query_invalid_subcommand(mock_db, capsys):
+    """Test invalid query subcommand."""
+    args = MagicMock(subcommand="invalid")
+
+    result = handle_query_command(args, mock_db)
+    assert result == 1
+    assert capsys.readouterr().out == "Missing subcommand. Use 'add', 'remove', 'rename', 'interval', or 'list'.\n"
@@ -0,0 +1,29 @@
+"""Tests for the token command handler."""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from pyflexweb.handlers import handle_token_command
+
+
+@pytest.mark.parametrize(
+    ("subcommand", "db_method", "db_return", "db_args", "expected_rc", "expected_msg"),
+    [
+        pytest.param("set", "set_token", None, ("test_token",), 0, "Token set successfully.", id="set"),
+        pytest.param("get", "get_token", "test_token_value", (), 0, "Stored token: test_token_value", id="get"),
+        pytest.param("get", "get_token", None, (), 1, "No token found. Set one with 'pyflexweb token set <token>'", id="get-missing"),
+        pytest.param("unset", "unset_token", None, (), 0, "Token removed.", id="unset"),
+        pytest.param("invalid", None, None, None, 1, "Missing subcommand. Use 'set', 'get', or 'unset'.", id="invalid"),
+    ],
+)
+def test_token_command(mock_db, capsys, subcommand, db_method, db_return, db_args, expected_rc, expected_msg):
+    """Each token subcommand calls its database method once and prints a single message."""
+    args = MagicMock(subcommand=subcommand, token="test_token")
+    if db_method:
+        getattr(mock_db, db_method).return_value = db_return
+
+    assert handle_token_command(args, mock_db) == expected_rc
+    if db_method:
+        getattr(mock_db, db_method).assert_called_once_with(*db_args)
+    assert capsys.readouterr().out == expected_msg + "\n"